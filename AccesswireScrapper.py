@@ -1,19 +1,40 @@
+import asyncio
 import logging
-import re
+import threading
 import time
 from datetime import datetime
-from zoneinfo import ZoneInfo
-from bs4 import BeautifulSoup
-from curl_cffi import requests
+import page_parser
+from ticker_extractor import extract_tickers
 from news_scraper import NewsArticle  # Assuming it's defined as per your earlier script
+from scrape_engine import get_engine, emit
+from pipeline import SAVED, SKIPPED
+from metrics import LISTING_FETCH_SECONDS, LISTING_ITEMS, PARSE_SECONDS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# stands in for the releases of a listing page that failed to load
+_GAP = object()
+
 class AccesswireScraper:
+    SOURCE = "accesswire"
     BASE_URL = "https://www.accessnewswire.com/newsroom/api"
-
-    def __init__(self):
+    STATE_KEY = "accesswire_high_water_mark"
+
+    def __init__(self, known_urls=None, engine=None):
+        self.engine = engine or get_engine()
+        self.known_urls = known_urls if known_urls is not None else set()
+        # newest releaseurl already ingested; paging stops once it is reached
+        self.high_water_mark = None
+        self._stored_mark = None
+        # releases above the mark from the last listing pass, oldest first, and
+        # the outcome of each one handled so far; the mark only moves up through
+        # releases that were stored or permanently rejected
+        self._pending = []
+        self._outcomes = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
         self.headers = {
             "origin": "https://www.accessnewswire.com",
             "user-agent": (
@@ -24,75 +45,185 @@ class AccesswireScraper:
         }
 
     def get_latest_news(self, max_pages=5):
+        return self.engine.run(self.fetch_latest_news(max_pages))
+
+    async def fetch_latest_news(self, max_pages=5, on_article=None):
+        """Scrape the newsroom API; ``on_article`` receives each article as soon as it is parsed.
+
+        Articles handed out here move the high-water mark only once they are
+        reported back through ``settle``.
+        """
+        high_water_mark = self.high_water_mark
+        if self._needs_rescan():
+            # any page may be unchanged while releases on it still wait for a retry
+            for page in range(max_pages):
+                self.engine.forget_listing(self.listing_url(page))
+
+        # page 0 usually holds everything new; only fan out when it does not
+        # reach the newest release we have already ingested
+        first = await self._fetch_page(0)
+        pages = [first]
+        reached = first is not None and (not first or self._mark_index(first, high_water_mark) is not None)
+        if max_pages > 1 and not reached:
+            pages += await asyncio.gather(*(self._fetch_page(page) for page in range(1, max_pages)))
+
+        new_items = []
+        for page, items in enumerate(pages):
+            if items is None:
+                new_items.append(_GAP)
+                continue
+            stop = self._mark_index(items, high_water_mark)
+            # everything above the high-water mark is new
+            new_items += items[:stop]
+            if stop is not None:
+                logger.info(f"[Accesswire] Reached last-seen article on page {page}")
+                break
+        handled = self._track(new_items) if first else set()
+
         articles = []
+        for idx, item in enumerate(new_items):
+            if item is _GAP or item.get("releaseurl") in handled:
+                continue
+            LISTING_ITEMS.labels(self.SOURCE).inc()
+            start = time.perf_counter()
+            article = self._parse_item(idx, item)
+            PARSE_SECONDS.labels(self.SOURCE, "detail").observe(time.perf_counter() - start)
+            if article:
+                articles.append(article)
+                if on_article is not None:
+                    with self._lock:
+                        self._in_flight.add(article.url)
+                    await emit(on_article, article)
+            else:
+                # known, without tickers or unparseable: nothing to retry
+                self.settle(item.get("releaseurl"), SKIPPED)
 
-        for page in range(max_pages):
-            url = (
-                f"{self.BASE_URL}?pageindex={page}"
-                f"&pageSize=20"
+        logger.info(f"[Accesswire] Scraped {len(articles)} valid articles")
+        return articles
+
+    def listing_url(self, page):
+        return f"{self.BASE_URL}?pageindex={page}&pageSize=20"
+
+    def _track(self, new_items):
+        """Start following the releases above the mark, listed newest first.
+
+        Returns the ones that need no new parse: still in the pipeline from an
+        earlier pass, or already stored or rejected.
+        """
+        pending = [item if item is _GAP else item.get("releaseurl") for item in reversed(new_items)]
+        with self._lock:
+            self._pending = [url for url in pending if url]
+            self._outcomes = {
+                url: outcome for url, outcome in self._outcomes.items()
+                if url in self._pending and outcome in (SAVED, SKIPPED)
+            }
+            return self._in_flight | self._outcomes.keys()
+
+    def _needs_rescan(self):
+        with self._lock:
+            return any(
+                url is _GAP or self._outcomes.get(url, SAVED) not in (SAVED, SKIPPED)
+                for url in self._pending
             )
 
+    def settle(self, url, outcome):
+        """Record the ingest outcome of a release; returns True if the mark moved."""
+        with self._lock:
+            self._in_flight.discard(url)
+            if url not in self._pending:
+                return False
+            self._outcomes[url] = outcome
+            mark = None
+            for pending in self._pending:
+                if pending is _GAP or self._outcomes.get(pending) not in (SAVED, SKIPPED):
+                    break
+                mark = pending
+            if mark is None or mark == self.high_water_mark:
+                return False
+            self.high_water_mark = mark
+            return True
+
+    @staticmethod
+    def _mark_index(items, high_water_mark):
+        """Position of the high-water-mark release in ``items``, or None."""
+        if not high_water_mark:
+            return None
+        for i, item in enumerate(items):
+            if item.get("releaseurl") == high_water_mark:
+                return i
+        return None
+
+    def _parse_item(self, idx, item):
+        try:
+            title = item.get("title", "No title").strip()
+            url = item.get("releaseurl")
+            if url in self.known_urls:
+                return None
+            summary_html = item.get("body", "")
+            summary = page_parser.parse(summary_html).text(strip=True)
+
+            raw_date = item.get("adate", "").strip()
+            if not raw_date:
+                logger.warning("[Accesswire] No adate field found in article JSON.")
+                return None
+
             try:
-                resp = requests.post(url, headers=self.headers, impersonate="chrome110", timeout=3)
-                resp.raise_for_status()
-                data = resp.json()
+                dt = datetime.fromisoformat(raw_date)
             except Exception as e:
-                logger.error(f"[Accesswire] Failed to fetch page {page}: {e}")
-                continue
+                logger.warning(f"[Accesswire] Failed to parse ISO date '{raw_date}': {e}")
+                return None
+
+            tickers = extract_tickers(summary)
+            if not tickers:
+                return None
+
+            return NewsArticle(
+                title=title,
+                summary=summary,
+                url=url,
+                tickers=tickers,
+                published_at=dt  # naive adate values are taken as Eastern
+            )
 
-            items = data.get("data", {}).get("articles", [])
+        except Exception as e:
+            logger.error(f"[Accesswire] Failed to parse article {idx}: {e}")
+            return None
+
+    async def _fetch_page(self, page):
+        """Return the page's article dicts, [] if unchanged or empty, None on failure."""
+        url = self.listing_url(page)
+
+        try:
+            with LISTING_FETCH_SECONDS.labels(self.SOURCE).time():
+                resp = await self.engine.get_listing(url, method="POST", headers=self.headers, timeout=3)
+            if resp is None:
+                logger.info(f"[Accesswire] Page {page} unchanged, skipping parse")
+                return []
+            start = time.perf_counter()
+            items = resp.json().get("data", {}).get("articles", [])
+            PARSE_SECONDS.labels(self.SOURCE, "listing").observe(time.perf_counter() - start)
             if not items:
                 logger.warning(f"[Accesswire] No articles found on page {page}")
-                continue
-
-            for idx, item in enumerate(items):
-                try:
-                    title = item.get("title", "No title").strip()
-                    url = item.get("releaseurl")
-                    summary_html = item.get("body", "")
-                    summary = BeautifulSoup(summary_html, "html.parser").get_text(strip=True)
-
-                    raw_date = item.get("adate", "").strip()
-                    if not raw_date:
-                        logger.warning("[Accesswire] No adate field found in article JSON.")
-                        continue
-
-                    try:
-                        dt = datetime.fromisoformat(raw_date)
-                    except Exception as e:
-                        logger.warning(f"[Accesswire] Failed to parse ISO date '{raw_date}': {e}")
-                        continue
-
-                    tickers = self.extract_tickers(summary)
-                    if not tickers:
-                        continue
-
-                    article = NewsArticle(
-                        title=title,
-                        summary=summary,
-                        url=url,
-                        published_date=dt.date(),
-                        published_time=dt.time(),
-                        tickers=tickers
-                    )
-                    articles.append(article)
-
-                except Exception as e:
-                    logger.error(f"[Accesswire] Failed to parse article {idx}: {e}")
-
-        logger.info(f"[Accesswire] Scraped {len(articles)} valid articles")
-        return articles
-
-    def extract_tickers(self, text):
-        patterns = [
-            r'\b(?:NASDAQ|Nasdaq|nasdaq):\s*([A-Z][A-Z0-9\.]{1,10})',
-            r'\b(?:NYSE|Nyse|nyse):\s*([A-Z][A-Z0-9\.]{1,10})'
-        ]
-        found = []
-        for pat in patterns:
-            found.extend(re.findall(pat, text))
-
-        return list({t.upper().strip() for t in found if t})
+            return items
+        except Exception as e:
+            logger.error(f"[Accesswire] Failed to fetch page {page}: {e}")
+            return None
+
+    def load_high_water_mark(self, database):
+        """Restore the newest ingested release URL persisted by a previous run."""
+        with self._save_lock, self._lock:
+            self.high_water_mark = database.get_state(self.STATE_KEY)
+            self._stored_mark = self.high_water_mark
+            self._pending = []
+            self._outcomes = {}
+            self._in_flight = set()
+
+    def save_high_water_mark(self, database):
+        """Persist the high-water mark if it has moved since it was last stored."""
+        with self._save_lock:
+            mark = self.high_water_mark
+            if mark and mark != self._stored_mark and database.set_state(self.STATE_KEY, mark):
+                self._stored_mark = mark
 
 # if __name__ == "__main__":
 #     scraper = AccesswireScraper()
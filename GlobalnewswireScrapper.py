@@ -1,7 +1,25 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+import page_parser
+from known_urls import KnownUrls
+from ticker_extractor import extract_tickers
+from news_scraper import NewsArticle, ET
+from scrape_engine import get_engine, emit
+from metrics import DETAIL_FETCH_SECONDS, LISTING_FETCH_SECONDS, LISTING_ITEMS, PARSE_SECONDS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
 class GlobalNewswireScraper:
+    SOURCE = "globenewswire"
     BASE_URL = "https://www.globenewswire.com/newsroom"
 
-    def __init__(self, headers=None):
+    def __init__(self, headers=None, known_urls=None, engine=None):
+        self.engine = engine or get_engine()
+        self.known_urls = known_urls if known_urls is not None else KnownUrls()
         self.headers = headers or {
             "User-Agent": (
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -13,84 +31,109 @@ class GlobalNewswireScraper:
         }
 
     def get_latest_news(self, max_pages=1):
-        from curl_cffi import requests
-        from bs4 import BeautifulSoup
-        from datetime import datetime
-        from zoneinfo import ZoneInfo
-        import logging
-        # NewsArticle must be imported from the project where defined
-        try:
-            from news_scraper import NewsArticle
-        except ImportError:
-            NewsArticle = dict  # fallback to dict for demonstration
-
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        handler.setFormatter(logging.Formatter('%(levelname)s:%(message)s'))
-        logger.addHandler(handler)
-        articles = []
-
-        for page in range(1, max_pages + 1):
-            try:
-                url = f"{self.BASE_URL}?page={page}&pageSize=50"
-                resp = requests.get(url, headers=self.headers, impersonate="chrome110", timeout=30)
-                resp.raise_for_status()
-                soup = BeautifulSoup(resp.text, "html.parser")
-                parent_divs = soup.select("div.newsLink")
-
-                for parent_div in parent_divs:
-                    try:
-                        title_tag = parent_div.select_one("div.mainLink > a")
-                        date_tag = parent_div.select_one("div.date-source span")
-
-                        if not title_tag or not date_tag:
-                            continue
-
-                        title = title_tag.text.strip()
-                        article_url = "https://www.globenewswire.com" + title_tag["href"]
-                        date_str = date_tag.text.strip()  # e.g. April 25, 2025 06:16 ET
-                        print("⏱️ Date string found:", date_str)
-
-                        dt = datetime.strptime(date_str.replace(" ET", ""), "%B %d, %Y %H:%M")
-                        dt = dt.replace(tzinfo=ZoneInfo("America/New_York"))
-
-                        summary = title  # Placeholder as summary extraction isn't detailed
-                        # Fetch the article content and extract tickers from it
-                        article_resp = requests.get(article_url, headers=self.headers, impersonate="chrome110", timeout=30)
-                        article_resp.raise_for_status()
-                        article_soup = BeautifulSoup(article_resp.text, "html.parser")
-                        article_body_text = article_soup.get_text(separator=' ', strip=True)
-                        tickers = self.extract_tickers(article_body_text)
-
-                        if not tickers:
-                            continue
-
-                        article = NewsArticle(
-                            title=title,
-                            summary=summary,
-                            url=article_url,
-                            published_date=dt.date(),
-                            published_time=dt.time(),
-                            tickers=tickers
-                        )
-                        articles.append(article)
-                    except Exception as e:
-                        logger.warning(f"[GlobalNewswire] Error parsing article: {e}")
-            except Exception as e:
-                logger.error(f"[GlobalNewswire] Failed to fetch page {page}: {e}")
+        return self.engine.run(self.fetch_latest_news(max_pages))
+
+    async def fetch_latest_news(self, max_pages=1, on_article=None):
+        """Scrape the newsroom; ``on_article`` receives each article as soon as it is parsed."""
+        listing_urls = [self.listing_url(page) for page in range(1, max_pages + 1)]
+        pages = await asyncio.gather(*(self._fetch_listing(page) for page in range(1, max_pages + 1)))
+        candidates = [c for page_items in pages for c in page_items]
+        results = await asyncio.gather(
+            *(self._fetch_item(*c, on_article=on_article) for c in candidates), return_exceptions=True
+        )
+        if any(isinstance(r, Exception) for r in results):
+            # re-parse next cycle even if the newsroom is unchanged, so failed items are retried
+            for url in listing_urls:
+                self.engine.forget_listing(url)
+        articles = [a for a in results if isinstance(a, NewsArticle)]
+        logger.info(f"[GlobalNewswire] Scraped {len(articles)} valid articles")
         return articles
 
-    def extract_tickers(self, text):
-        import re
-        patterns = [
-            r'\b(?:NASDAQ|Nasdaq|nasdaq):\s*([A-Z][A-Z0-9\.]{1,10})',
-            r'\b(?:NYSE|Nyse|nyse)(?:\s+American)?:\s*([A-Z][A-Z0-9\.]{1,10})'
+    async def discover(self, max_pages=1):
+        """Listing pass only: a fetch-queue job for every new detail page."""
+        pages = await asyncio.gather(*(self._fetch_listing(page) for page in range(1, max_pages + 1)))
+        return [
+            {"url": url, "title": title, "published_at": dt.isoformat()}
+            for page_items in pages for title, url, dt in page_items
         ]
-        found = []
-        for pat in patterns:
-            found.extend(re.findall(pat, text))
-        return list(set(t.upper().strip() for t in found if t))
+
+    async def fetch_job(self, job, on_article=None):
+        """Fetch and parse one queued detail page; errors propagate so the job is retried."""
+        dt = datetime.fromisoformat(job["published_at"])
+        return await self._fetch_item(job["title"], job["url"], dt, on_article=on_article)
+
+    def listing_url(self, page):
+        return f"{self.BASE_URL}?page={page}&pageSize=50"
+
+    async def _fetch_listing(self, page):
+        """Return (title, url, datetime) for every not-yet-stored item on a newsroom page."""
+        candidates = []
+        try:
+            with LISTING_FETCH_SECONDS.labels(self.SOURCE).time():
+                resp = await self.engine.get_listing(self.listing_url(page), headers=self.headers)
+            if resp is None:
+                logger.info(f"[GlobalNewswire] Page {page} unchanged, skipping parse")
+                return candidates
+            parse_start = time.perf_counter()
+            doc = page_parser.parse(resp.text)
+            parent_divs = doc.select("div.newsLink")
+
+            for parent_div in parent_divs:
+                try:
+                    title_tag = parent_div.select_one("div.mainLink > a")
+                    date_tag = parent_div.select_one("div.date-source span")
+
+                    if not title_tag or not date_tag:
+                        continue
+
+                    title = title_tag.text().strip()
+                    article_url = "https://www.globenewswire.com" + title_tag["href"]
+                    if article_url in self.known_urls:
+                        continue
+                    date_str = date_tag.text().strip()  # e.g. April 25, 2025 06:16 ET
+
+                    dt = datetime.strptime(date_str.replace(" ET", ""), "%B %d, %Y %H:%M")
+                    dt = dt.replace(tzinfo=ET)
+                    candidates.append((title, article_url, dt))
+                except Exception as e:
+                    logger.warning(f"[GlobalNewswire] Error parsing article: {e}")
+            PARSE_SECONDS.labels(self.SOURCE, "listing").observe(time.perf_counter() - parse_start)
+            LISTING_ITEMS.labels(self.SOURCE).inc(len(candidates))
+        except Exception as e:
+            logger.error(f"[GlobalNewswire] Failed to fetch page {page}: {e}")
+        return candidates
+
+    async def _fetch_item(self, title, article_url, dt, on_article=None):
+        try:
+            summary = title  # Placeholder as summary extraction isn't detailed
+            # Fetch the article content and extract tickers from it
+            with DETAIL_FETCH_SECONDS.labels(self.SOURCE).time():
+                article_resp = await self.engine.get(article_url, headers=self.headers)
+            article_resp.raise_for_status()
+            # off the engine's event loop, like PRNewswire's detail parse
+            tickers = await asyncio.to_thread(self._detail_tickers, article_resp)
+
+            if not tickers:
+                self.known_urls.reject(article_url)
+                return None
+
+            article = NewsArticle(
+                title=title,
+                summary=summary,
+                url=article_url,
+                tickers=tickers,
+                published_at=dt
+            )
+        except Exception as e:
+            logger.warning(f"[GlobalNewswire] Error parsing article: {e}")
+            raise
+        await emit(on_article, article)
+        return article
+
+    def _detail_tickers(self, resp):
+        with PARSE_SECONDS.labels(self.SOURCE, "detail").time():
+            # only the text is needed, so skip building a tree
+            return extract_tickers(page_parser.page_text(resp.text))
 
 
 # if __name__ == "__main__":
@@ -103,4 +146,4 @@ class GlobalNewswireScraper:
 #         print(f"    📰 URL      : {article.url}")
 #         print(f"    🕒 Published: {article.published_date} {article.published_time}")
 #         print(f"    💹 Tickers  : {', '.join(article.tickers)}")
-#         print(f"    🔍 Summary  : {article.summary[:200]}...\n")
\ No newline at end of file
+#         print(f"    🔍 Summary  : {article.summary[:200]}...\n")
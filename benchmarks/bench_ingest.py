@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Article ingestion throughput: per-article ORM saves vs. the batched save_articles.
+
+"legacy" replays the old save_article path (SELECT by url, SELECT/INSERT each
+ticker, flush, commit per article); "batch" is NewsDatabase.save_articles. Both
+write synthetic articles under https://example.invalid/bench-ingest/ and
+synthetic ZB0000-style tickers; afterwards the articles and exactly the
+tickers this run created are deleted again.
+
+Point it at a scratch database with --dsn. Running against the database the
+app is configured with (PG_* variables) needs --i-know. Either way the new-article
+NOTIFYs go to a channel no web worker listens on, so live SSE clients never
+see the synthetic rows.
+
+    python benchmarks/bench_ingest.py --dsn postgresql://localhost/newsdb_bench --articles 500
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import events  # noqa: E402
+from models import db, Article, Ticker, upgrade_schema  # noqa: E402
+from news_scraper import NewsArticle  # noqa: E402
+from pg_database import NewsDatabase  # noqa: E402
+
+URL_PREFIX = "https://example.invalid/bench-ingest/"
+# save_articles NOTIFYs on events.CHANNEL; nothing listens on this one
+events.CHANNEL = "newsdb_bench_ingest"
+
+
+def bench_symbols(n_symbols):
+    # no listed symbol is ZB followed by four digits
+    return [f"ZB{n:04d}" for n in range(n_symbols)]
+
+
+def make_articles(run, n_articles, tickers_per_article, symbols):
+    base = datetime(2999, 1, 1, tzinfo=timezone.utc)
+    return [
+        NewsArticle(
+            title=f"Ingest probe {run} {i}",
+            summary="benchmark",
+            url=f"{URL_PREFIX}{run}/{i}",
+            published_at=base + timedelta(minutes=i),
+            tickers=[symbols[(i + k) % len(symbols)] for k in range(tickers_per_article)],
+        )
+        for i in range(n_articles)
+    ]
+
+
+def legacy_save(article):
+    """The pre-batch save_article, minus float data."""
+    try:
+        if Article.query.filter_by(url=article.url).first():
+            return None
+        new_article = Article(
+            title=article.title,
+            summary=article.summary,
+            url=article.url,
+            published_at=article.published_at,
+            published_date=article.published_date,
+            published_time=article.published_time,
+        )
+        for sym in article.tickers:
+            ticker = Ticker.query.filter_by(symbol=sym).first()
+            if not ticker:
+                ticker = Ticker(symbol=sym)
+                db.session.add(ticker)
+                db.session.flush()
+            new_article.tickers.append(ticker)
+        db.session.add(new_article)
+        db.session.flush()
+        db.session.commit()
+        return new_article.id
+    except Exception:
+        db.session.rollback()
+        return None
+
+
+def cleanup(news_db, symbols):
+    """Delete the synthetic articles and the given tickers."""
+    db.session.query(Article).filter(Article.url.like(f"{URL_PREFIX}%")).delete(synchronize_session=False)
+    db.session.query(Ticker).filter(Ticker.symbol.in_(symbols)).delete(synchronize_session=False)
+    db.session.commit()
+    news_db._ticker_cache.clear()
+
+
+def timed(label, fn, n):
+    start = time.perf_counter()
+    saved = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {saved:>5}/{n} saved  {elapsed * 1000:8.1f} ms  {n / elapsed:9.1f} articles/s")
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--tickers-per-article", type=int, default=3)
+    parser.add_argument("--symbols", type=int, default=200, help="distinct synthetic tickers")
+    parser.add_argument("--dsn", help="SQLAlchemy URL of a scratch database to benchmark against")
+    parser.add_argument("--i-know", action="store_true",
+                        help="write to the database configured through PG_* instead")
+    args = parser.parse_args()
+    n = args.articles
+
+    if args.dsn:
+        from flask import Flask
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = args.dsn
+        app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(app)
+        news_db = NewsDatabase()
+        with app.app_context():
+            upgrade_schema()
+    elif args.i_know:
+        from run import app, news_db
+    else:
+        parser.error("pass --dsn for a scratch database, or --i-know to use the app's configured database")
+
+    with app.app_context():
+        symbols = bench_symbols(args.symbols)
+        # never delete a ticker that was there before the run
+        existing = {sym for (sym,) in db.session.query(Ticker.symbol).filter(Ticker.symbol.in_(symbols))}
+        created = [sym for sym in symbols if sym not in existing]
+        if existing:
+            print(f"keeping {len(existing)} pre-existing bench tickers")
+        cleanup(news_db, created)
+        try:
+            legacy = make_articles("legacy", n, args.tickers_per_article, symbols)
+            before = timed("per-article (legacy)", lambda: sum(legacy_save(a) is not None for a in legacy), n)
+
+            cleanup(news_db, created)
+            batch = make_articles("batch", n, args.tickers_per_article, symbols)
+            after = timed("save_articles (batch)", lambda: len(news_db.save_articles(batch)[0]), n)
+
+            # the same batch again: every URL conflicts and nothing is written
+            timed("save_articles (replay)", lambda: len(news_db.save_articles(batch)[0]), n)
+            print(f"speedup: {after / before:.1f}x")
+        finally:
+            cleanup(news_db, created)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Offline parser benchmarks on saved pages.
+
+Every parse path the scrapers run per cycle is timed against the fixtures in
+benchmarks/fixtures/, with the network replaced by a stand-in engine that
+serves those files: listing and detail parsing for each wire, whole
+``fetch_latest_news`` cycles, ticker extraction on each wire's text, and
+FinvizScraper's screener and quote-page extraction. For each case it reports
+pages/second, CPU per page and the tracemalloc peak per page, using the
+HTML parser backend picked by HTML_PARSER or ``--parser``.
+
+    python benchmarks/bench_parsers.py --save benchmarks/results/parsers_baseline.json
+    python benchmarks/bench_parsers.py --compare benchmarks/results/parsers_baseline.json
+    python benchmarks/bench_parsers.py --only prnewswire --min-time 3
+    python benchmarks/bench_parsers.py --parser html.parser --compare ...
+    python benchmarks/bench_parsers.py --record    # refresh the fixtures from the live sites
+
+The committed fixtures are hand-built reproductions of each site's markup
+(same selectors, attributes and date formats, comparable page size); run
+``--record`` from a machine with network access to replace them with
+captured pages, and re-save the baseline afterwards.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# validate extracted tickers against the fixtures' own symbol master
+os.environ.setdefault("SYMBOL_MASTER", os.path.join(FIXTURES, "symbols.csv"))
+
+import bs4  # noqa: E402
+import page_parser  # noqa: E402
+from news_scraper import PRNewswireScraper  # noqa: E402
+from GlobalnewswireScrapper import GlobalNewswireScraper  # noqa: E402
+from AccesswireScrapper import AccesswireScraper  # noqa: E402
+from finviz_news_scraper import FinvizScraper  # noqa: E402
+from ticker_extractor import extract_tickers  # noqa: E402
+
+FINVIZ_SCREENER_URL = "https://finviz.com/screener.ashx?v=111&f=sh_float_u10"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FixtureResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        pass
+
+
+class FixtureEngine:
+    """Stand-in for ScrapeEngine: every listing request gets ``listing``, every detail request ``detail``."""
+
+    def __init__(self, listing, detail=None):
+        self.listing = listing
+        self.detail = detail
+
+    async def get_listing(self, url, method="GET", **kwargs):
+        return FixtureResponse(self.listing)
+
+    async def get(self, url, **kwargs):
+        return FixtureResponse(self.detail)
+
+    def forget_listing(self, url):
+        pass
+
+
+class Case:
+    def __init__(self, name, fn, pages=1):
+        self.name = name
+        self.fn = fn
+        self.pages = pages
+
+
+def build_cases(loop):
+    run = loop.run_until_complete
+    pr_listing, pr_detail = fixture("prnewswire_listing.html"), fixture("prnewswire_detail.html")
+    gn_listing, gn_detail = fixture("globenewswire_newsroom.html"), fixture("globenewswire_article.html")
+    aw_listing = fixture("accesswire_newsroom.json")
+    fv_screener, fv_quote = fixture("finviz_screener.html"), fixture("finviz_quote.html")
+
+    pr = PRNewswireScraper(engine=FixtureEngine(pr_listing, pr_detail))
+    gn = GlobalNewswireScraper(engine=FixtureEngine(gn_listing, gn_detail))
+    aw = AccesswireScraper(engine=FixtureEngine(aw_listing))
+    fv = FinvizScraper()
+
+    pr_items = run(pr._fetch_listing(1))
+    gn_items = run(gn._fetch_listing(1))
+    aw_items = run(aw._fetch_page(0))
+    if not (pr_items and gn_items and aw_items):
+        raise SystemExit("fixtures produced no listing items; the scrapers' selectors no longer match them")
+    pr_url = pr_items[0][2]
+    gn_title, gn_url, gn_dt = gn_items[0]
+
+    # the text each scraper hands to extract_tickers
+    pr_text = run(pr.fetch_article(pr_url))[1]
+    gn_text = page_parser.page_text(gn_detail)
+    aw_texts = [page_parser.parse(item.get("body", "")).text(strip=True) for item in aw_items]
+
+    def finviz_screener():
+        # extract_tickers_from_page writes a debug file into the cwd
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                return run(fv.extract_tickers_from_page(fv_screener, 1))
+            finally:
+                os.chdir(cwd)
+
+    return [
+        Case("prnewswire.listing", lambda: run(pr._fetch_listing(1))),
+        Case("prnewswire.detail", lambda: run(pr.fetch_article(pr_url))),
+        Case("prnewswire.cycle", lambda: run(pr.fetch_latest_news(1)), pages=1 + len(pr_items)),
+        Case("globenewswire.listing", lambda: run(gn._fetch_listing(1))),
+        Case("globenewswire.detail", lambda: run(gn._fetch_item(gn_title, gn_url, gn_dt))),
+        Case("globenewswire.cycle", lambda: run(gn.fetch_latest_news(1)), pages=1 + len(gn_items)),
+        Case("accesswire.listing", lambda: run(aw._fetch_page(0))),
+        Case("accesswire.cycle", lambda: run(aw.fetch_latest_news(1))),
+        Case("extract_tickers.prnewswire", lambda: extract_tickers(pr_text)),
+        Case("extract_tickers.globenewswire", lambda: extract_tickers(gn_text)),
+        Case("extract_tickers.accesswire", lambda: [extract_tickers(t) for t in aw_texts], pages=len(aw_texts)),
+        Case("finviz.screener", finviz_screener),
+        Case("finviz.quote_data", lambda: run(fv.extract_quote_data("ABCD", fv_quote))),
+        Case("finviz.quote_news", lambda: run(fv.extract_news_from_quote_page("ABCD", fv_quote))),
+    ]
+
+
+def measure(case, min_time, min_runs):
+    case.fn()  # warm-up: imports, regex and selector caches
+    walls, cpus = [], []
+    deadline = time.perf_counter() + min_time
+    while len(walls) < min_runs or time.perf_counter() < deadline:
+        wall, cpu = time.perf_counter(), time.process_time()
+        case.fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    # allocations are measured on a separate run; tracing slows everything down
+    tracemalloc.start()
+    case.fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall = statistics.median(walls)
+    return {
+        "pages_per_op": case.pages,
+        "runs": len(walls),
+        "wall_ms": round(wall * 1000, 3),
+        "cpu_ms_per_page": round(statistics.mean(cpus) * 1000 / case.pages, 3),
+        "pages_per_s": round(case.pages / wall, 1),
+        "peak_kib_per_page": round(peak / 1024 / case.pages, 1),
+    }
+
+
+def git_commit():
+    """Short HEAD hash, suffixed "-dirty" if tracked files differ from it."""
+    try:
+        # --dirty so numbers measured on uncommitted code never claim a commit
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty", "--abbrev=7"], capture_output=True, text=True,
+            cwd=os.path.dirname(FIXTURES),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def report(results, baseline=None):
+    base = (baseline or {}).get("cases", {})
+    head = f"{'case':<32} {'pages/s':>10} {'cpu ms/pg':>10} {'peak KiB/pg':>12}"
+    print(head + ("   vs baseline (pages/s, cpu, peak)" if base else ""))
+    for name, r in results.items():
+        line = f"{name:<32} {r['pages_per_s']:>10.1f} {r['cpu_ms_per_page']:>10.3f} {r['peak_kib_per_page']:>12.1f}"
+        b = base.get(name)
+        if b:
+            line += (
+                f"   {r['pages_per_s'] / b['pages_per_s']:6.2f}x"
+                f" {r['cpu_ms_per_page'] / max(b['cpu_ms_per_page'], 0.001):6.2f}x"
+                f" {r['peak_kib_per_page'] / max(b['peak_kib_per_page'], 0.1):6.2f}x"
+            )
+        print(line)
+
+
+def record():
+    """Download fresh copies of every fixture from the live sites."""
+    from curl_cffi import requests as curl_requests
+
+    session = curl_requests.Session(impersonate="chrome110", timeout=30)
+
+    def get(url, headers=None, method="GET"):
+        resp = session.request(method, url, headers=headers)
+        resp.raise_for_status()
+        return resp.text
+
+    def save(name, text):
+        with open(os.path.join(FIXTURES, name), "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"saved {name} ({len(text)} bytes)")
+
+    pr = PRNewswireScraper(engine=object())
+    listing = get(pr.listing_url(1), pr.headers)
+    save("prnewswire_listing.html", listing)
+    link = page_parser.parse(listing).select_one("a.newsreleaseconsolidatelink")
+    save("prnewswire_detail.html", get("https://www.prnewswire.com" + link["href"], pr.headers))
+
+    gn = GlobalNewswireScraper(engine=object())
+    listing = get(gn.listing_url(1), gn.headers)
+    save("globenewswire_newsroom.html", listing)
+    link = page_parser.parse(listing).select_one("div.newsLink div.mainLink > a")
+    save("globenewswire_article.html", get("https://www.globenewswire.com" + link["href"], gn.headers))
+
+    aw = AccesswireScraper(engine=object())
+    save("accesswire_newsroom.json", get(f"{aw.BASE_URL}?pageindex=0&pageSize=20", aw.headers, method="POST"))
+
+    fv = FinvizScraper()
+    screener = get(FINVIZ_SCREENER_URL, fv.headers)
+    save("finviz_screener.html", screener)
+    link = page_parser.parse(screener).select_one("a[href*='quote.ashx?t=']")
+    symbol = link.text(strip=True) if link else "AAPL"
+    save("finviz_quote.html", get(f"{fv.base_url}/quote.ashx?t={symbol}", fv.headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--parser", choices=page_parser.BACKENDS, help="HTML parser backend (default: HTML_PARSER)")
+    parser.add_argument("--only", help="run cases whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend timing each case")
+    parser.add_argument("--min-runs", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="results JSON to compare against")
+    parser.add_argument("--record", action="store_true", help="re-download the fixtures and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record()
+        return
+
+    if args.parser:
+        page_parser.set_backend(args.parser)
+    print(f"HTML parser backend: {page_parser.BACKEND}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    # FinvizScraper prints progress for every page it parses
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        cases = build_cases(loop)
+        for case in cases:
+            if args.only and args.only not in case.name:
+                continue
+            results[case.name] = measure(case, args.min_time, args.min_runs)
+    loop.close()
+
+    report(results, baseline)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "parser": page_parser.BACKEND,
+                    "bs4": bs4.__version__,
+                },
+                "cases": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"saved results to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
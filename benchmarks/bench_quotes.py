@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-symbol vs batched quote fetching.
+
+Runs a local stand-in for Yahoo's v7 quote endpoint with a fixed per-request
+latency and times StockDataFetcher.get_batch_quotes both ways, so the result
+reflects round trips rather than Yahoo's mood.
+
+    python benchmarks/bench_quotes.py --symbols 60 --latency 0.08
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stock_data import StockDataFetcher  # noqa: E402
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    latency = 0.08
+    requests_seen = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with QuoteHandler.lock:
+            QuoteHandler.requests_seen += 1
+        time.sleep(self.latency)
+        symbols = parse_qs(urlsplit(self.path).query).get("symbols", [""])[0].split(",")
+        rows = [
+            {
+                "symbol": sym,
+                "shortName": f"{sym} Corp",
+                "regularMarketPrice": 1.0 + i,
+                "sharesOutstanding": 20_000_000 + i,
+                "floatShares": 10_000_000 + i,
+                "marketCap": 50_000_000 + i,
+            }
+            for i, sym in enumerate(symbols) if sym
+        ]
+        body = json.dumps({"quoteResponse": {"result": rows}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(label, fn):
+    QuoteHandler.requests_seen = 0
+    start = time.perf_counter()
+    got = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed * 1000:8.1f} ms  {QuoteHandler.requests_seen:4d} requests  {len(got):4d} symbols")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.08, help="seconds per stand-in request")
+    parser.add_argument("--workers", type=int, default=5, help="per-symbol fan-out, as in production")
+    args = parser.parse_args()
+
+    QuoteHandler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QuoteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    fetcher = StockDataFetcher(
+        max_workers=args.workers,
+        quote_url=f"http://127.0.0.1:{server.server_port}/v7/finance/quote",
+    )
+    symbols = [f"T{i:03d}" for i in range(args.symbols)]
+
+    def per_symbol():
+        results = {}
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for data in executor.map(lambda s: fetcher.get_batch_quotes([s], batch_size=1), symbols):
+                results.update(data)
+        return results
+
+    try:
+        slow = run("per-symbol", per_symbol)
+        fast = run("batched", lambda: fetcher.get_batch_quotes(symbols))
+        print(f"speed-up     {slow / fast:8.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Query-count guard for the article list and detail views.
+
+Seeds synthetic articles inside a transaction that is rolled back afterwards,
+counts the SQL statements each read path issues, and exits non-zero when a
+path goes over its budget (i.e. an N+1 has crept back in). Uses the database
+configured through the usual PG_* environment variables.
+
+    python benchmarks/check_query_count.py --articles 50 --tickers-per-article 3
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from run import app, news_db  # noqa: E402
+from models import db, Article, Ticker, FloatData  # noqa: E402
+
+BUDGETS = {
+    "get_recent_articles": 3,   # articles + tickers + float data
+    "get_article_by_id": 3,     # article + tickers + float data
+}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def seed(n_articles, tickers_per_article):
+    tickers = []
+    for i in range(n_articles * tickers_per_article):
+        t = Ticker(symbol=f"ZQ{i:04d}")
+        db.session.add(t)
+        db.session.add(FloatData(ticker_symbol=t.symbol, float_shares=1_000_000 + i))
+        tickers.append(t)
+    db.session.flush()
+    for i in range(n_articles):
+        art = Article(
+            title=f"Query-count probe {i}",
+            url=f"https://example.invalid/query-count/{i}",
+            published_at=datetime(2999, 1, 1, 12, i % 60, tzinfo=timezone.utc),
+        )
+        for t in tickers[i * tickers_per_article:(i + 1) * tickers_per_article]:
+            art.tickers.append(t)
+        db.session.add(art)
+    db.session.flush()
+    return art.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--tickers-per-article", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    with app.app_context():
+        try:
+            article_id = seed(args.articles, args.tickers_per_article)
+            engine = db.engine
+            checks = {
+                "get_recent_articles": lambda: news_db.get_recent_articles(page=1, page_size=args.articles),
+                "get_article_by_id": lambda: news_db.get_article_by_id(article_id),
+            }
+            for name, fn in checks.items():
+                with QueryCounter(engine) as counter:
+                    fn()
+                ok = counter.count <= BUDGETS[name]
+                failed |= not ok
+                print(f"{name:<22} {counter.count:3d} queries (budget {BUDGETS[name]}) {'ok' if ok else 'FAIL'}")
+        finally:
+            db.session.rollback()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Live UI events over Postgres LISTEN/NOTIFY.
+
+The ingestion side (monitor process or a manual refresh in any web worker)
+publishes on one channel; every web process runs a single EventBroker that
+LISTENs on a dedicated connection and fans events out to its SSE clients.
+Article notifications are sent inside the inserting transaction, so clients
+only hear about rows that are committed.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from sqlalchemy import func
+from models import db
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CHANNEL = "newsdb_events"
+# NOTIFY payloads are capped at 8000 bytes; ids are sent in chunks well under that
+_IDS_PER_NOTIFY = 500
+# a larger status goes out as an empty ping and clients fetch /api/status
+_MAX_STATUS_BYTES = 7000
+
+
+def _notify(target, kind, data):
+    payload = json.dumps({"type": kind, "data": data}, default=str)
+    target.execute(db.select(func.pg_notify(CHANNEL, payload)))
+
+
+def publish_articles(article_ids):
+    """Queue a new-articles event on the current session; sent when it commits."""
+    article_ids = list(article_ids)
+    for i in range(0, len(article_ids), _IDS_PER_NOTIFY):
+        _notify(db.session, "articles", article_ids[i:i + _IDS_PER_NOTIFY])
+
+
+def publish_status(status, conn=None):
+    """Send a status event, on ``conn``'s transaction if given, else right away.
+
+    Without ``conn`` this needs an app context.
+    """
+    if len(json.dumps(status, default=str).encode()) > _MAX_STATUS_BYTES:
+        # an oversized NOTIFY would abort the transaction writing the status
+        status = None
+    if conn is not None:
+        _notify(conn, "status", status)
+        return
+    try:
+        with db.engine.begin() as own:
+            _notify(own, "status", status)
+    except Exception as e:
+        logger.warning(f"Failed to publish status event: {e}")
+
+
+class EventBroker:
+    """Per-process LISTEN loop fanning notifications out to subscriber queues.
+
+    The listener thread starts with the first subscriber, so each gunicorn
+    worker gets its own after the fork. New-article ids are loaded once here and
+    the full rows pushed to every client.
+    """
+
+    def __init__(self, app, database, client_queue_size=100, poll_timeout=5):
+        self.app = app
+        self.database = database
+        self.client_queue_size = client_queue_size
+        self.poll_timeout = poll_timeout
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.client_queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen_forever, name="event-broker", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def broadcast(self, kind, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait((kind, data))
+            except queue.Full:
+                # a stalled client misses events rather than holding up the rest
+                logger.debug("Dropping event for a slow SSE client")
+
+    # -- listener ---------------------------------------------------------
+    def _listen_forever(self):
+        backoff = 1
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"[Events] Listener failed, reconnecting in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            else:
+                backoff = 1
+
+    def _listen(self):
+        with self.app.app_context():
+            raw = db.engine.raw_connection()
+            conn = raw.driver_connection
+            raw.detach()  # held for the life of the listener, not returned to the pool
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                logger.info(f"[Events] Listening on '{CHANNEL}'")
+                while True:
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            finally:
+                raw.close()
+
+    def _dispatch(self, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"[Events] Ignoring malformed payload: {payload[:100]}")
+            return
+        if event.get("type") == "articles":
+            # oldest first, so clients prepending each row end up newest on top
+            for article in reversed(self.database.get_articles_by_ids(event["data"])):
+                self.broadcast("article", article.to_dict())
+            db.session.remove()
+        else:
+            self.broadcast(event.get("type", "message"), event.get("data"))
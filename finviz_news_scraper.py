@@ -1,6 +1,6 @@
 import asyncio
 from curl_cffi.requests import AsyncSession
-from bs4 import BeautifulSoup
+import page_parser
 import pandas as pd
 import time
 from typing import List, Dict
@@ -53,7 +53,7 @@ class FinvizScraper:
 
     async def extract_tickers_from_page(self, html: str, page_num: int) -> List[str]:
         """Extract ticker symbols from screener page"""
-        soup = BeautifulSoup(html, 'html.parser')
+        doc = page_parser.parse(html)
         tickers = []
 
         # Debug: Save HTML to file for inspection
@@ -62,50 +62,45 @@ class FinvizScraper:
 
         # Method 1: Look for ticker links with various possible classes
         ticker_patterns = [
-            {'tag': 'a', 'class': 'screener-link-primary'},
-            {'tag': 'a', 'class': 'screener-link'},
-            {'tag': 'a', 'attrs': {'href': re.compile(r'/quote\.ashx\?t=')}},
+            'a.screener-link-primary',
+            'a.screener-link',
+            'a[href*="/quote.ashx?t="]',
         ]
 
         for pattern in ticker_patterns:
-            if 'attrs' in pattern:
-                elements = soup.find_all(pattern['tag'], attrs=pattern['attrs'])
-            else:
-                elements = soup.find_all(pattern['tag'], class_=pattern.get('class'))
-
-            for elem in elements:
-                ticker = elem.text.strip()
+            for elem in doc.select(pattern):
+                ticker = elem.text().strip()
                 if ticker and len(ticker) <= 5 and ticker.isalpha():  # Basic ticker validation
                     tickers.append(ticker)
 
         # Method 2: Look for table with id "screener-views-table"
-        table = soup.find('table', {'id': 'screener-views-table'})
+        table = doc.select_one('table#screener-views-table')
         if table:
             print(f"Found screener table on page {page_num}")
-            rows = table.find_all('tr')[1:]  # Skip header
+            rows = table.select('tr')[1:]  # Skip header
             for row in rows:
-                cells = row.find_all('td')
+                cells = row.select('td')
                 if len(cells) > 1:  # Usually ticker is in second column
-                    ticker_cell = cells[1].find('a')
+                    ticker_cell = cells[1].select_one('a')
                     if ticker_cell:
-                        ticker = ticker_cell.text.strip()
+                        ticker = ticker_cell.text().strip()
                         if ticker:
                             tickers.append(ticker)
 
         # Method 3: Look for any table and try to find tickers
         if not tickers:
-            all_tables = soup.find_all('table')
+            all_tables = doc.select('table')
             print(f"Found {len(all_tables)} tables on page {page_num}")
 
             for table in all_tables:
                 # Check if table has screener data
-                table_text = table.text
+                table_text = table.text()
                 if 'Ticker' in table_text or 'Symbol' in table_text:
-                    rows = table.find_all('tr')
+                    rows = table.select('tr')
                     for row in rows:
-                        links = row.find_all('a', href=re.compile(r'/quote\.ashx\?t='))
+                        links = row.select('a[href*="/quote.ashx?t="]')
                         for link in links:
-                            ticker = link.text.strip()
+                            ticker = link.text().strip()
                             if ticker and len(ticker) <= 5:
                                 tickers.append(ticker)
 
@@ -158,22 +153,22 @@ class FinvizScraper:
 
     async def extract_news_from_quote_page(self, ticker: str, html: str) -> List[Dict]:
         """Extract news articles from quote page"""
-        soup = BeautifulSoup(html, 'html.parser')
+        doc = page_parser.parse(html)
         news_items = []
 
         try:
             # Find the news table - Finviz usually has news in a table
-            news_table = soup.find('table', {'id': 'news-table'})
+            news_table = doc.select_one('table#news-table')
 
             if news_table:
-                rows = news_table.find_all('tr')
+                rows = news_table.select('tr')
 
                 current_date = None
                 for row in rows:
                     # Get date/time info
-                    date_cell = row.find('td', {'align': 'right', 'width': '130'})
+                    date_cell = row.select_one('td[align="right"][width="130"]')
                     if date_cell:
-                        date_text = date_cell.text.strip()
+                        date_text = date_cell.text().strip()
                         # If it's a full date (e.g., "Nov-15-24")
                         if '-' in date_text and len(date_text) > 7:
                             current_date = date_text
@@ -182,18 +177,18 @@ class FinvizScraper:
                             date_text = f"{current_date} {date_text}"
 
                     # Get news link and title
-                    news_cell = row.find('td', {'align': 'left'})
+                    news_cell = row.select_one('td[align="left"]')
                     if news_cell:
-                        link_elem = news_cell.find('a', {'class': 'tab-link-news'})
+                        link_elem = news_cell.select_one('a.tab-link-news')
                         if link_elem:
-                            news_title = link_elem.text.strip()
+                            news_title = link_elem.text().strip()
                             news_url = link_elem.get('href', '')
 
                             # Get source (usually in same cell, after the link)
                             source = ''
-                            source_span = news_cell.find('span')
+                            source_span = news_cell.select_one('span')
                             if source_span:
-                                source = source_span.text.strip()
+                                source = source_span.text().strip()
 
                             news_items.append({
                                 'ticker': ticker,
@@ -212,39 +207,40 @@ class FinvizScraper:
 
     async def extract_quote_data(self, ticker: str, html: str) -> Dict:
         """Extract float, price, and volume from quote page"""
-        soup = BeautifulSoup(html, 'html.parser')
+        doc = page_parser.parse(html)
         data = {'ticker': ticker, 'shares_float': None, 'shares_float_m': None, 'price': None, 'volume': None}
 
         try:
             # Find the snapshot table - try multiple selectors
             snapshot_table = None
             table_selectors = [
-                {'class': 'snapshot-table2'},
-                {'class': 'snapshot-table'},
-                {'class': 'table-dark-row'}
+                'table.snapshot-table2',
+                'table.snapshot-table',
+                'table.table-dark-row'
             ]
 
             for selector in table_selectors:
-                snapshot_table = soup.find('table', selector)
+                snapshot_table = doc.select_one(selector)
                 if snapshot_table:
                     break
 
             if not snapshot_table:
                 # Try to find any table with financial data
-                all_tables = soup.find_all('table')
+                all_tables = doc.select('table')
                 for table in all_tables:
-                    if 'Shs Float' in table.text or 'Price' in table.text:
+                    table_text = table.text()
+                    if 'Shs Float' in table_text or 'Price' in table_text:
                         snapshot_table = table
                         break
 
             if snapshot_table:
                 # Get all cells
-                cells = snapshot_table.find_all('td')
+                cells = snapshot_table.select('td')
 
                 for i in range(0, len(cells), 2):  # Data usually in pairs (label, value)
                     if i + 1 < len(cells):
-                        label = cells[i].text.strip()
-                        value = cells[i + 1].text.strip()
+                        label = cells[i].text().strip()
+                        value = cells[i + 1].text().strip()
 
                         # Look for Shs Float
                         if 'Shs Float' in label:
@@ -278,15 +274,15 @@ class FinvizScraper:
             if data['price'] is None:
                 # Look for price in various possible locations
                 price_selectors = [
-                    {'class': 'quote-price'},
-                    {'class': 'quote-last'},
-                    {'id': 'quote-price'}
+                    '.quote-price',
+                    '.quote-last',
+                    '#quote-price'
                 ]
 
                 for selector in price_selectors:
-                    price_elem = soup.find('div', selector) or soup.find('span', selector)
+                    price_elem = doc.select_one(f'div{selector}') or doc.select_one(f'span{selector}')
                     if price_elem:
-                        price_match = re.search(r'([\d.]+)', price_elem.text)
+                        price_match = re.search(r'([\d.]+)', price_elem.text())
                         if price_match:
                             data['price'] = float(price_match.group(1))
                             break
@@ -0,0 +1,285 @@
+"""
+Postgres-backed queue of detail-page fetch jobs.
+
+Listing passes enqueue one job per new article URL (deduplicated on the URL).
+Any number of monitor processes, on any host, claim batches with
+``FOR UPDATE SKIP LOCKED``, so detail fetching and float enrichment spread
+across them. A claimed job that is not finished within the visibility timeout
+becomes claimable again; failed jobs are retried with exponential backoff up
+to ``max_attempts``.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from known_urls import reject_ttl_default
+from models import db, FetchJob
+from pipeline import FAILED
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_CLAIM = db.text("""
+    UPDATE fetch_jobs AS j
+    SET status = 'running', attempts = j.attempts + 1, locked_by = :worker,
+        visible_at = now() + make_interval(secs => :timeout), updated_at = now()
+    FROM (
+        SELECT id FROM fetch_jobs
+        WHERE status IN ('pending', 'running') AND visible_at <= now() AND attempts < :max_attempts
+        ORDER BY visible_at, id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) AS next
+    WHERE j.id = next.id
+    RETURNING j.id, j.url, j.source, j.payload, j.attempts
+""")
+
+_COMPLETE = db.text("""
+    UPDATE fetch_jobs SET status = 'done', locked_by = NULL, last_error = NULL, updated_at = now()
+    WHERE id = ANY(:ids) AND locked_by = :worker AND status = 'running'
+""")
+
+_FAIL = db.text("""
+    UPDATE fetch_jobs SET
+        status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+        visible_at = now() + make_interval(secs => LEAST(:retry_base * power(2, attempts - 1), :retry_cap)),
+        locked_by = NULL, last_error = :error, updated_at = now()
+    WHERE id = :id AND locked_by = :worker AND status = 'running'
+""")
+
+_EXPIRE = db.text("""
+    UPDATE fetch_jobs SET status = 'failed', locked_by = NULL, updated_at = now(),
+        last_error = COALESCE(last_error, 'visibility timeout exceeded')
+    WHERE status = 'running' AND visible_at <= now() AND attempts >= :max_attempts
+""")
+
+_PRUNE = db.text("""
+    DELETE FROM fetch_jobs
+    WHERE status IN ('done', 'failed') AND updated_at < now() - make_interval(secs => :keep)
+""")
+
+
+class FetchQueue:
+    """Enqueue/claim/ack operations on ``fetch_jobs``. Needs an app context."""
+
+    def __init__(self, visibility_timeout=120, max_attempts=5, retry_base=30, retry_cap=1800,
+                 keep_finished=2 * 86400, requeue_after=None):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        # finished jobs are kept this long so a listing that still shows the
+        # URL (e.g. an article without tickers) does not enqueue it again
+        self.keep_finished = keep_finished
+        # ...except that a finished job whose article was not stored is queued
+        # again after this long, matching how long KnownUrls remembers a rejection
+        self.requeue_after = reject_ttl_default() if requeue_after is None else requeue_after
+
+    def enqueue(self, source, jobs):
+        """Add ``{"url": ..., ...}`` payloads; returns how many were queued.
+
+        URLs already queued are ignored, unless their job finished more than
+        ``requeue_after`` seconds ago without the article being stored.
+        """
+        rows = {job["url"]: job for job in jobs}
+        if not rows:
+            return 0
+        table = FetchJob.__table__
+        try:
+            stmt = pg_insert(table).values(
+                [{"url": url, "source": source, "payload": job} for url, job in sorted(rows.items())]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["url"],
+                set_={
+                    "source": stmt.excluded.source, "payload": stmt.excluded.payload,
+                    "status": "pending", "attempts": 0, "visible_at": db.func.now(),
+                    "locked_by": None, "last_error": None, "updated_at": db.func.now(),
+                },
+                where=db.and_(
+                    table.c.status == "done",
+                    table.c.updated_at < db.func.now() - timedelta(seconds=self.requeue_after),
+                    # stored articles are never fetched again
+                    db.text("NOT EXISTS (SELECT 1 FROM articles WHERE articles.url = fetch_jobs.url)"),
+                ),
+            ).returning(table.c.id)
+            added = len(db.session.execute(stmt).all())
+            db.session.commit()
+            return added
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Failed to enqueue {len(rows)} {source} jobs: {e}")
+            return 0
+
+    def claim(self, worker_id, limit):
+        """Lease up to ``limit`` claimable jobs to ``worker_id``."""
+        try:
+            rows = db.session.execute(_CLAIM, {
+                "worker": worker_id, "timeout": self.visibility_timeout,
+                "max_attempts": self.max_attempts, "limit": limit,
+            }).mappings().all()
+            db.session.commit()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Claim failed: {e}")
+            return []
+
+    def complete(self, worker_id, job_ids):
+        if not job_ids:
+            return
+        try:
+            db.session.execute(_COMPLETE, {"ids": list(job_ids), "worker": worker_id})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Failed to complete jobs {job_ids}: {e}")
+
+    def fail(self, worker_id, job_id, error):
+        try:
+            db.session.execute(_FAIL, {
+                "id": job_id, "worker": worker_id, "error": str(error)[:1000],
+                "max_attempts": self.max_attempts, "retry_base": self.retry_base, "retry_cap": self.retry_cap,
+            })
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Failed to record failure of job {job_id}: {e}")
+
+    def prune(self):
+        """Give up on expired leases that used their last attempt and drop old finished jobs."""
+        try:
+            expired = db.session.execute(_EXPIRE, {"max_attempts": self.max_attempts}).rowcount
+            pruned = db.session.execute(_PRUNE, {"keep": self.keep_finished}).rowcount
+            db.session.commit()
+            if expired or pruned:
+                logger.info(f"[FetchQueue] Expired {expired} jobs, pruned {pruned} finished jobs")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Prune failed: {e}")
+
+    def stats(self):
+        """Queue depth: pending and running jobs, and how many are claimable now."""
+        try:
+            rows = (
+                db.session.query(
+                    FetchJob.status,
+                    db.func.count(),
+                    db.func.count().filter(
+                        FetchJob.visible_at <= db.func.now(), FetchJob.attempts < self.max_attempts
+                    ),
+                )
+                # only live jobs, so this stays on ix_fetch_jobs_claimable
+                .filter(FetchJob.status.in_(('pending', 'running')))
+                .group_by(FetchJob.status)
+                .all()
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"[FetchQueue] Stats failed: {e}")
+            return {}
+        stats = {"pending": 0, "running": 0, "ready": 0}
+        for status, count, ready in rows:
+            stats[status] = count
+            stats["ready"] += ready
+        return stats
+
+
+class FetchWorker:
+    """Thread that claims fetch jobs and runs them on the scrape engine.
+
+    Parsed articles go to ``on_article(article, on_done)`` (the ingest
+    pipeline's ``submit``), which reports each article's outcome. A job is
+    acknowledged once its article was saved or permanently skipped, or when
+    the page had nothing to ingest; a fetch error, a transient pipeline failure
+    or no outcome within ``settle_timeout`` sends it back for a retry. A crash
+    mid-batch leaves the jobs to be re-claimed after the visibility timeout.
+    """
+
+    def __init__(self, app, queue, scrapers, engine, on_article,
+                 batch_size=10, poll_interval=2.0, settle_timeout=60, worker_id=None):
+        self.app = app
+        self.queue = queue
+        self.scrapers = {s.SOURCE: s for s in scrapers}
+        self.engine = engine
+        self.on_article = on_article
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.settle_timeout = settle_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="fetch-worker", daemon=True)
+        self._thread.start()
+        logger.info(f"[FetchWorker] {self.worker_id} started")
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        with self.app.app_context():
+            while self.running:
+                try:
+                    if not self.run_once():
+                        time.sleep(self.poll_interval)
+                except Exception as e:
+                    logger.error(f"[FetchWorker] Batch failed: {e}", exc_info=True)
+                    time.sleep(self.poll_interval)
+
+    def run_once(self):
+        """Claim and process one batch; returns the number of jobs claimed."""
+        jobs = self.queue.claim(self.worker_id, self.batch_size)
+        if not jobs:
+            return 0
+
+        # outcome per submitted article URL; None until the pipeline reports it
+        outcomes = {}
+        settled = threading.Condition()
+
+        def on_done(article, outcome):
+            with settled:
+                outcomes[article.url] = outcome
+                settled.notify_all()
+
+        def submit(article):
+            with settled:
+                outcomes[article.url] = None
+            self.on_article(article, on_done=on_done)
+
+        results = self.engine.gather(*(self._run_job(job, submit) for job in jobs))
+        with settled:
+            # only this batch's own articles, not everything else in the pipeline
+            settled.wait_for(lambda: None not in outcomes.values(), timeout=self.settle_timeout)
+            outcomes = dict(outcomes)
+
+        done = []
+        for job, result in zip(jobs, results):
+            if not isinstance(result, Exception) and result is not None:
+                outcome = outcomes.get(job["url"])
+                if outcome is None:
+                    result = TimeoutError(f"not ingested within {self.settle_timeout}s")
+                elif outcome == FAILED:
+                    result = RuntimeError("ingest pipeline failed to store the article")
+            if isinstance(result, Exception):
+                logger.warning(f"[FetchWorker] Job {job['id']} attempt {job['attempts']} failed: {result}")
+                self.queue.fail(self.worker_id, job["id"], result)
+            else:
+                done.append(job["id"])
+        self.queue.complete(self.worker_id, done)
+        logger.info(f"[FetchWorker] Finished {len(done)}/{len(jobs)} jobs")
+        return len(jobs)
+
+    async def _run_job(self, job, on_article):
+        scraper = self.scrapers.get(job["source"])
+        if scraper is None:
+            raise ValueError(f"no scraper for source '{job['source']}'")
+        return await scraper.fetch_job(job["payload"], on_article=on_article)
@@ -0,0 +1,61 @@
+"""
+In-process set of article URLs the scrapers do not need to download again.
+
+Stored articles stay in it for good. URLs that were fetched and rejected (no
+tickers, no float data) are remembered for ``reject_ttl`` seconds, so the
+listing that keeps showing them does not cost a detail download every cycle,
+yet they are looked at again once the float data may have changed.
+"""
+import os
+import threading
+import time
+
+
+def reject_ttl_default():
+    """Seconds a rejected URL is left alone; REJECTED_URL_TTL, by default 6h."""
+    # same lifetime as cached float data
+    return float(os.getenv("REJECTED_URL_TTL", 6 * 3600))
+
+
+class KnownUrls:
+    """Thread-safe set of stored article URLs plus expiring rejections."""
+
+    def __init__(self, reject_ttl=None):
+        self.reject_ttl = reject_ttl_default() if reject_ttl is None else reject_ttl
+        self._lock = threading.Lock()
+        self._urls = set()
+        self._rejected = {}  # url -> monotonic expiry
+        self._prune_at = 0.0
+
+    def seed(self, urls):
+        with self._lock:
+            self._urls.update(urls)
+
+    def add(self, url):
+        with self._lock:
+            self._urls.add(url)
+            self._rejected.pop(url, None)
+
+    def reject(self, url):
+        """Skip ``url`` for ``reject_ttl`` seconds."""
+        if not url:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._rejected[url] = now + self.reject_ttl
+            if now >= self._prune_at:
+                self._rejected = {u: t for u, t in self._rejected.items() if t > now}
+                self._prune_at = now + 60
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+            self._rejected.clear()
+
+    def __contains__(self, url):
+        with self._lock:
+            return url in self._urls or self._rejected.get(url, 0) > time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._urls)
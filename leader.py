@@ -0,0 +1,121 @@
+"""
+Leader election for the background monitor via a Postgres advisory lock.
+
+Only the process holding the lock runs the listing passes; every other
+monitor stays warm as a standby (its fetch worker keeps helping with queued
+detail pages) and retries the lock every few seconds on the connection it
+keeps open for that. The lock is tied to one dedicated connection, so it is
+released the moment the leader's process exits or its connection drops, and
+a standby takes over on its next attempt.
+"""
+import logging
+import os
+import socket
+import zlib
+from models import db
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# stable 32-bit key derived from a name, so unrelated advisory locks don't collide
+DEFAULT_LOCK_KEY = zlib.crc32(b"newsdb.monitor")
+
+# Server-side keepalives on the lock connection: if the leader's host vanishes
+# without closing the socket, Postgres drops the session (and the lock) after
+# roughly idle + interval * count seconds instead of the OS default of hours.
+_KEEPALIVES = {"tcp_keepalives_idle": 5, "tcp_keepalives_interval": 2, "tcp_keepalives_count": 2}
+
+# The same on the client side (libpq), so a leader cut off from the database
+# notices it and steps down instead of blocking in _alive() on a dead socket;
+# statement_timeout bounds the lock and liveness queries themselves.
+_CONNECT_ARGS = {
+    "keepalives": 1, "keepalives_idle": 5, "keepalives_interval": 2, "keepalives_count": 2,
+    "connect_timeout": 5, "options": "-c statement_timeout=5000",
+}
+
+
+class LeaderLease:
+    """Session-level ``pg_try_advisory_lock`` held on a dedicated connection."""
+
+    def __init__(self, app, key=None, name=None):
+        self.app = app
+        self.key = key if key is not None else int(os.getenv("MONITOR_LOCK_KEY", DEFAULT_LOCK_KEY))
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = None
+        self._held = False
+
+    @property
+    def is_leader(self):
+        return self._held
+
+    def acquire(self):
+        """Try to become (or confirm we still are) the leader. Never blocks."""
+        if self._held:
+            if self._alive():
+                return True
+            logger.warning(f"[Leader] {self.name} lost its lock connection, stepping down")
+            self._drop()
+            return False
+        try:
+            # standbys keep their connection between attempts
+            conn = self._connect()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                got = cur.fetchone()[0]
+        except Exception as e:
+            logger.error(f"[Leader] Lock attempt failed: {e}")
+            self._drop()
+            return False
+        if not got:
+            return False
+        self._held = True
+        logger.info(f"[Leader] {self.name} acquired monitor lock {self.key}")
+        return True
+
+    def release(self):
+        if self._conn is None:
+            return
+        if self._held:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+            except Exception as e:
+                logger.warning(f"[Leader] Unlock failed (connection close releases it): {e}")
+            logger.info(f"[Leader] {self.name} released monitor lock")
+        self._drop()
+
+    def _connect(self):
+        """The lease's own connection, outside the pool, opened on first use."""
+        if self._conn is not None and not self._conn.closed:
+            return self._conn
+        with self.app.app_context():
+            engine = db.engine
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        conn = engine.dialect.connect(*cargs, **dict(cparams, **_CONNECT_ARGS))
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for setting, value in _KEEPALIVES.items():
+                    cur.execute(f"SET {setting} = {int(value)}")
+        except Exception:
+            conn.close()
+            raise
+        self._conn = conn
+        return conn
+
+    def _alive(self):
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _drop(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+        self._held = False
@@ -10,13 +10,16 @@ import time
 import logging
 import threading
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
 from GlobalnewswireScrapper import GlobalNewswireScraper
-from models import db
 from pg_database import NewsDatabase
 from news_scraper import PRNewswireScraper, NewsArticle
 from AccesswireScrapper import AccesswireScraper
-from stock_data import StockDataFetcher
+from stock_data import StockDataFetcher, FloatCache
+from scrape_engine import get_engine, timed
+from scheduler import PollScheduler
+from pipeline import IngestPipeline
+from job_queue import FetchQueue, FetchWorker
+from leader import LeaderLease
 from run import app
 from run import scraper_status
 
@@ -27,90 +30,144 @@ logger = logging.getLogger(__name__)
 
 class DataMonitor:
     def __init__(self):
-        self.pr_scraper = PRNewswireScraper()
-        self.access_scraper = AccesswireScraper()
-        self.stock_fetcher = StockDataFetcher()
-        self.global_scraper = GlobalNewswireScraper()
         self.database = NewsDatabase()
+        self.engine = get_engine()
+        self.pr_scraper = PRNewswireScraper(known_urls=self.database.known_urls)
+        self.access_scraper = AccesswireScraper(known_urls=self.database.known_urls)
+        self.stock_fetcher = StockDataFetcher(cache=FloatCache(store=self.database))
+        self.global_scraper = GlobalNewswireScraper(known_urls=self.database.known_urls)
+        self.pipeline = IngestPipeline(
+            app, self.database, self.stock_fetcher,
+            enrich_workers=self.stock_fetcher.max_workers,
+            on_saved=self._on_article_saved,
+        )
+        # PRNewswire and GlobeNewswire detail pages go through the shared fetch
+        # queue, so every running monitor helps with them; Accesswire lists
+        # full items and has no detail pages to distribute
+        self.jobs = FetchQueue()
+        self.fetch_worker = FetchWorker(
+            app, self.jobs, [self.pr_scraper, self.global_scraper], self.engine,
+            on_article=self.pipeline.submit,
+            batch_size=int(os.getenv("FETCH_BATCH_SIZE", 10)),
+        )
+        # Listing passes, one per source. Accesswire streams articles straight
+        # into the pipeline; the other two return detail-page jobs for the
+        # fetch queue. Each runs on its own adaptive timer.
+        self.sources = {
+            PRNewswireScraper.SOURCE: lambda: self.pr_scraper.discover(1),
+            AccesswireScraper.SOURCE: lambda: self.access_scraper.fetch_latest_news(5, on_article=self._submit_accesswire),
+            GlobalNewswireScraper.SOURCE: lambda: self.global_scraper.discover(1),
+        }
+        self.scheduler = PollScheduler(self.sources)
+        self._inflight = {}
+        # only the lease holder runs listing passes; the rest wait as standbys
+        self.lease = LeaderLease(app)
+        self.standby_interval = float(os.getenv("MONITOR_STANDBY_INTERVAL", 2))
         self.running = True
         self.status = "Initializing"
 
     def run(self):
         with app.app_context():
-            try:
-                db.create_all()
-                logger.info("Database tables initialized.")
-            except Exception as e:
-                logger.warning(f"DB setup error: {e}")
+            # importing run already created and upgraded the schema
+            self.database.load_known_urls()
+            self.access_scraper.load_high_water_mark(self.database)
+            self.pipeline.start()
+            self.fetch_worker.start()
 
             while self.running:
+                self._collect()
+                if not self._lead():
+                    time.sleep(self.standby_interval)
+                    continue
                 try:
-                    self.status = "Fetching latest articles..."
-                    scraper_status.update(message="Fetching latest articles...", progress=5)
-                    articles = []
-
-                    # Run both scrapers concurrently
-                    with ThreadPoolExecutor(max_workers=3) as executor:
-                        futures = [
-                            executor.submit(self.pr_scraper.get_latest_news, 1),
-                            executor.submit(self.access_scraper.get_latest_news, 5),
-                            executor.submit(self.global_scraper.get_latest_news, 1),
-                        ]
-                        for idx, future in enumerate(futures, 1):
-                            try:
-                                result = future.result()
-                                articles.extend(result)
-                                logger.info(f"[Source {idx}] Retrieved {len(result)} articles.")
-                            except Exception as e:
-                                logger.error(f"[Source {idx}] Scraper failed: {e}")
-                    logger.info(f"Total fetched articles: {len(articles)}")
-                    scraper_status.update(progress=20)
-
-                    # Filter valid articles with tickers
-                    articles = [a for a in articles if a.tickers]
-                    logger.info(f"Articles with tickers: {len(articles)}")
-                    if not articles:
-                        logger.info("No articles with tickers found. Sleeping...")
-                        time.sleep(30)
-                        continue
-
-                    articles.sort(key=lambda a: (a.published_date, a.published_time), reverse=True)
-
-                    # Fetch float data
-                    all_tickers = {t for art in articles for t in art.tickers}
-                    float_data = self.stock_fetcher.get_batch_float_data(list(all_tickers))
-
-                    saved_count = 0
-                    for art in articles:
-                        art.float_data = {t: float_data.get(t, {}) for t in art.tickers}
-                        logger.info(f"Checking article {art.title} — float_data: {art.float_data}")
-
-                        if not any(art.float_data.values()):
-                            logger.info(f"Skipping '{art.title}' — no float data")
-                            continue
-
-                        logger.info(f"Saving article: {art.url} with tickers {art.tickers}")
-                        self.database.save_article(art)
-                        saved_count += 1
-                        scraper_status.update(progress=int((saved_count / len(articles)) * 70) + 20)
-
-                    self.status = f"Saved {saved_count}/{len(articles)} articles. Sleeping 60s."
-                    scraper_status.update(
-                        message=f"Saved {saved_count}/{len(articles)} articles.",
-                        progress=100,
-                        last_update=datetime.utcnow().isoformat()
-                    )
-                    logger.info(self.status)
-                    time.sleep(30)
-
+                    for source in self.scheduler.due():
+                        self._start(source)
                 except Exception as e:
                     logger.error(f"[Monitor Error] {e}", exc_info=True)
                     self.status = f"Error: {e}"
                     scraper_status.update(message=f"Error: {e}", progress=0)
-                    time.sleep(30)
+                time.sleep(self.scheduler.seconds_until_next())
+
+    def _start(self, source):
+        """Launch one source's listing pass on the engine without waiting for it."""
+        self.scheduler.start(source)
+        self._inflight[source] = self.engine.submit(timed(self.sources[source]()))
+
+    def _collect(self):
+        """Handle every finished listing pass and schedule that source's next run."""
+        finished = False
+        for source, future in list(self._inflight.items()):
+            if not future.done():
+                continue
+            del self._inflight[source]
+            finished = True
+            try:
+                result, seconds = future.result()
+                if isinstance(result, Exception):
+                    delay = self.scheduler.finish(source)
+                    logger.error(f"[{source}] Scraper failed after {seconds:.1f}s: {result}; retry in {delay:.0f}s")
+                    scraper_status.record_source(source, seconds, error=result, next_poll=delay)
+                    continue
+
+                if source == AccesswireScraper.SOURCE:
+                    # releases rejected while parsing may already have moved the
+                    # mark; the rest move it from _on_accesswire_done as they settle
+                    self.access_scraper.save_high_water_mark(self.database)
+                    new_items = len(result)
+                    message = f"{new_items} new articles"
+                else:
+                    # listings keep showing a URL until its job is done; only count first sightings
+                    new_items = self.jobs.enqueue(source, result)
+                    self.jobs.prune()
+                    message = f"{len(result)} pending items, {new_items} newly queued"
+
+                delay = self.scheduler.finish(source, new_items=new_items)
+                logger.info(f"[{source}] {message} in {seconds:.1f}s; next poll in {delay:.0f}s")
+                scraper_status.record_source(source, seconds, articles=new_items, next_poll=delay)
+                self.status = f"[{source}] {message}"
+                scraper_status.update(message=self.status, last_update=datetime.utcnow().isoformat())
+            except Exception as e:
+                logger.error(f"[Monitor Error] handling {source}: {e}", exc_info=True)
+                if self.scheduler.sources[source].running:
+                    self.scheduler.finish(source)
+        if finished:
+            logger.info(f"HTTP connection stats: {self.engine.connection_stats()}")
+
+    def _lead(self):
+        """Whether this process holds the monitor lease, taking it over if it is free."""
+        was_leader = self.lease.is_leader
+        if not self.lease.acquire():
+            if self.status != "Standby":
+                logger.info(f"[Monitor] {self.lease.name} is on standby")
+                self.status = "Standby"
+            return False
+        if not was_leader:
+            # the previous leader kept storing articles while we waited
+            self.database.load_known_urls()
+            self.access_scraper.load_high_water_mark(self.database)
+            scraper_status.update(leader=self.lease.name)
+        return True
+
+    def _submit_accesswire(self, article):
+        self.pipeline.submit(article, on_done=self._on_accesswire_done)
+
+    def _on_accesswire_done(self, article, outcome):
+        # runs on a pipeline stage thread, inside its app context
+        if self.access_scraper.settle(article.url, outcome):
+            self.access_scraper.save_high_water_mark(self.database)
+
+    def _on_article_saved(self, article):
+        # bump last_update per article so the UI picks it up without waiting for the cycle
+        scraper_status.update(
+            message=f"Saved: {article.title[:60]}",
+            last_update=datetime.utcnow().isoformat()
+        )
 
     def stop(self):
         self.running = False
+        self.fetch_worker.stop()
+        self.pipeline.stop()
+        self.lease.release()
         logger.info("Stopping DataMonitor.")
 
 
@@ -0,0 +1,57 @@
+"""
+Prometheus metrics for the scraper, ingest pipeline and web app.
+
+With PROMETHEUS_MULTIPROC_DIR set (start.sh does this), every process --
+the monitor and each gunicorn worker -- writes its samples to files in that
+directory and ``/metrics`` on any worker returns the sum across all of them.
+Without it, ``/metrics`` reports just the serving process.
+"""
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+_FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+_PARSE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+LISTING_FETCH_SECONDS = Histogram(
+    "newsdb_listing_fetch_seconds", "Listing page download time", ["source"], buckets=_FETCH_BUCKETS,
+)
+DETAIL_FETCH_SECONDS = Histogram(
+    "newsdb_detail_fetch_seconds", "Article detail page download time", ["source"], buckets=_FETCH_BUCKETS,
+)
+PARSE_SECONDS = Histogram(
+    "newsdb_parse_seconds", "HTML/JSON parse time", ["source", "page"], buckets=_PARSE_BUCKETS,
+)
+LISTING_ITEMS = Counter(
+    "newsdb_listing_items_total", "New (not yet stored) items found on listing pages", ["source"],
+)
+PIPELINE_ARTICLES = Counter(
+    "newsdb_pipeline_articles_total", "Articles through the ingest pipeline by outcome", ["outcome"],
+)
+YAHOO_SECONDS = Histogram(
+    "newsdb_yahoo_request_seconds", "Yahoo Finance / yfinance call time", ["call"], buckets=_FETCH_BUCKETS,
+)
+YAHOO_ERRORS = Counter(
+    "newsdb_yahoo_errors_total", "Failed Yahoo Finance / yfinance calls", ["call"],
+)
+DB_WRITE_SECONDS = Histogram(
+    "newsdb_db_write_seconds", "Database write transaction time", ["op"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PUBLISH_LAG_SECONDS = Histogram(
+    "newsdb_publish_lag_seconds", "Time from an article's published_at to it being stored",
+    buckets=(5, 15, 30, 60, 120, 300, 900, 1800, 3600, 4 * 3600, 24 * 3600),
+)
+
+
+def render():
+    """Exposition text for /metrics, summed over processes in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -2,8 +2,10 @@
 Database models for the stock news monitoring application.
 """
 import os
+import zlib
 from datetime import datetime, date, time
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 # Initialize SQLAlchemy
@@ -13,7 +15,9 @@ db = SQLAlchemy()
 article_tickers = db.Table(
     'article_tickers',
     db.Column('article_id', db.Integer, db.ForeignKey('articles.id', ondelete='CASCADE'), primary_key=True),
-    db.Column('ticker_id', db.Integer, db.ForeignKey('tickers.id', ondelete='CASCADE'), primary_key=True)
+    db.Column('ticker_id', db.Integer, db.ForeignKey('tickers.id', ondelete='CASCADE'), primary_key=True),
+    # per-ticker lookups: the PK leads with article_id, this one with ticker_id
+    db.Index('ix_article_tickers_ticker_article', 'ticker_id', 'article_id')
 )
 
 class Article(db.Model):
@@ -24,7 +28,9 @@ class Article(db.Model):
     summary = db.Column(db.Text)
     url = db.Column(db.String(1000), unique=True, nullable=False)
 
-    # Separate date and time columns
+    # Timezone-aware publication time; every ordering and range query uses it
+    published_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    # Eastern-time date and time kept alongside for display
     published_date = db.Column(db.Date, nullable=True)
     published_time = db.Column(db.Time, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -36,6 +42,12 @@ class Article(db.Model):
         lazy='dynamic'
     )
 
+    __table_args__ = (
+        # matches the list view's ORDER BY and keyset seek; INCLUDE makes the
+        # id/title/url part of a page an index-only scan
+        db.Index('ix_articles_published_at', 'published_at', 'id', postgresql_include=['title', 'url']),
+    )
+
     def __repr__(self):
         return f"<Article {self.id}: {self.title[:30]}...>"
 
@@ -49,6 +61,7 @@ class Article(db.Model):
             # isoformat date & HH:MM time
             'published_date': self.published_date.strftime('%Y-%m-%d') if self.published_date else '',
             'published_time': self.published_time.strftime('%H:%M') if self.published_time else '',
+            'published_at': self.published_at.isoformat() if self.published_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'tickers': [t.symbol for t in self.tickers.all()]
         }
@@ -64,15 +77,24 @@ class Ticker(db.Model):
     def __repr__(self):
         return f"<Ticker {self.symbol}>"
 
+def format_shares(value):
+    """Display form used across the UI: 12.34M / 1.20B."""
+    if value >= 1_000_000_000:
+        return f"{value / 1_000_000_000:.2f}B"
+    return f"{value / 1_000_000:.2f}M"
+
+
 class FloatData(db.Model):
     """Model for float data associated with tickers."""
     __tablename__ = 'float_data'
     id = db.Column(db.Integer, primary_key=True)
     ticker_symbol = db.Column(db.String(20), db.ForeignKey('tickers.symbol'), unique=True, nullable=False)
     company_name = db.Column(db.String(200))
+    # display string kept for older rows; float_shares is the source of truth
     float_value = db.Column(db.String(50))
-    price = db.Column(db.String(50))
-    market_cap = db.Column(db.String(50))
+    float_shares = db.Column(db.BigInteger, index=True)
+    price = db.Column(db.Numeric(18, 4), index=True)
+    market_cap = db.Column(db.BigInteger, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -80,9 +102,11 @@ class FloatData(db.Model):
         return {
             'symbol': self.ticker_symbol,
             'name': self.company_name,
-            'float': self.float_value,
-            'price': self.price,
-            'market_cap': self.market_cap
+            'float': format_shares(self.float_shares) if self.float_shares is not None else self.float_value,
+            'float_raw': self.float_shares,
+            'price': float(self.price) if self.price is not None else 'N/A',
+            'market_cap': f"${format_shares(self.market_cap)}" if self.market_cap is not None else 'N/A',
+            'market_cap_raw': self.market_cap
         }
 
     def __repr__(self):
@@ -105,3 +129,140 @@ class UserWatchlist(db.Model):
             'ticker_symbol': self.ticker_symbol,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class ScraperState(db.Model):
+    """Small key/value store for scraper bookkeeping that must survive restarts."""
+    __tablename__ = 'scraper_state'
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ScraperState {self.key}: {self.value}>"
+
+class StatusEntry(db.Model):
+    """Live scraper status shared by the monitor process and every web worker.
+
+    One row for the overall status ('global') and one per source
+    ('source:<name>'); ``data`` is merged with jsonb ``||`` on every write.
+    """
+    __tablename__ = 'scraper_status'
+    name = db.Column(db.String(100), primary_key=True)
+    data = db.Column(JSONB, nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    def __repr__(self):
+        return f"<StatusEntry {self.name}>"
+
+class FetchJob(db.Model):
+    """Detail-page fetch queued by a listing pass and claimed by any monitor.
+
+    ``visible_at`` is when the job may next be claimed: the retry time while
+    pending, the visibility timeout while running.
+    """
+    __tablename__ = 'fetch_jobs'
+    id = db.Column(db.BigInteger, primary_key=True)
+    url = db.Column(db.String(1000), unique=True, nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    payload = db.Column(JSONB, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    visible_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    locked_by = db.Column(db.String(200))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+
+    __table_args__ = (
+        # the claim query only ever looks at claimable rows, oldest first
+        db.Index('ix_fetch_jobs_claimable', 'visible_at', 'id',
+                 postgresql_where=db.text("status IN ('pending', 'running')")),
+    )
+
+    def __repr__(self):
+        return f"<FetchJob {self.id} {self.status}: {self.url}>"
+
+
+# Idempotent upgrades for databases created before a column or index existed.
+# db.create_all() only creates missing tables, so anything added to an existing
+# table has to be listed here. Append only: a database records how many of
+# these it has applied and only runs the ones after that.
+SCHEMA_UPGRADES = [
+    # numeric float data: convert the old display strings in place
+    "ALTER TABLE float_data ADD COLUMN IF NOT EXISTS float_shares BIGINT",
+    r"""
+    UPDATE float_data SET float_shares = (
+        regexp_replace(float_value, '[^0-9.]', '', 'g')::numeric
+        * CASE WHEN float_value LIKE '%B' THEN 1000000000 ELSE 1000000 END
+    )::bigint
+    WHERE float_shares IS NULL AND float_value ~ '^[0-9.]+[MB]$'
+    """,
+    r"""
+    DO $$ BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'float_data' AND column_name = 'price') = 'character varying' THEN
+            ALTER TABLE float_data ALTER COLUMN price TYPE NUMERIC(18, 4)
+                USING CASE WHEN price ~ '^[0-9]+(\.[0-9]+)?$' THEN price::numeric END;
+        END IF;
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'float_data' AND column_name = 'market_cap') = 'character varying' THEN
+            ALTER TABLE float_data ALTER COLUMN market_cap TYPE BIGINT
+                USING CASE WHEN market_cap ~ '^\$?[0-9.]+[MB]$' THEN (
+                    regexp_replace(market_cap, '[^0-9.]', '', 'g')::numeric
+                    * CASE WHEN market_cap LIKE '%B' THEN 1000000000 ELSE 1000000 END
+                )::bigint END;
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_float_data_float_shares ON float_data (float_shares)",
+    "CREATE INDEX IF NOT EXISTS ix_float_data_price ON float_data (price)",
+    "CREATE INDEX IF NOT EXISTS ix_float_data_market_cap ON float_data (market_cap)",
+    # single timestamptz published_at; replaces the date+time keyset index
+    "ALTER TABLE articles ADD COLUMN IF NOT EXISTS published_at TIMESTAMPTZ",
+    """
+    UPDATE articles SET published_at = COALESCE(
+        (published_date + COALESCE(published_time, TIME '00:00')) AT TIME ZONE 'America/New_York',
+        created_at AT TIME ZONE 'UTC',
+        now()
+    )
+    WHERE published_at IS NULL
+    """,
+    "ALTER TABLE articles ALTER COLUMN published_at SET NOT NULL",
+    "DROP INDEX IF EXISTS ix_articles_published_keyset",
+    "CREATE INDEX IF NOT EXISTS ix_articles_published_at ON articles (published_at, id) INCLUDE (title, url)",
+    "CREATE INDEX IF NOT EXISTS ix_article_tickers_ticker_article ON article_tickers (ticker_id, article_id)",
+    # a missing market cap used to be stored as 0
+    "UPDATE float_data SET market_cap = NULL WHERE market_cap = 0",
+]
+
+
+# stable key (as in leader.py) for the advisory lock around schema setup
+SCHEMA_LOCK_KEY = zlib.crc32(b"newsdb.schema")
+SCHEMA_VERSION_KEY = "schema_version"
+
+
+def upgrade_schema():
+    """Create missing tables and apply new SCHEMA_UPGRADES. Needs an app context.
+
+    Every gunicorn worker and the monitor call this on start, so it runs in one
+    transaction behind ``pg_advisory_xact_lock``: the first process does the
+    work and the others wait for it, then find nothing left to do. Upgrades
+    already applied are skipped, so a normal start takes no ALTER TABLE locks.
+    """
+    try:
+        conn = db.session.connection()
+        conn.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        db.metadata.create_all(bind=conn)
+        state = db.session.get(ScraperState, SCHEMA_VERSION_KEY)
+        applied = int(state.value) if state else 0
+        for statement in SCHEMA_UPGRADES[applied:]:
+            db.session.execute(db.text(statement))
+        if applied < len(SCHEMA_UPGRADES):
+            if state:
+                state.value = str(len(SCHEMA_UPGRADES))
+            else:
+                db.session.add(ScraperState(key=SCHEMA_VERSION_KEY, value=str(len(SCHEMA_UPGRADES))))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
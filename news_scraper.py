@@ -1,22 +1,38 @@
-import re
+import time
+import asyncio
 import logging
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, time as dtime
 from zoneinfo import ZoneInfo
-import time as tmod
 import trafilatura
-import gc
+import page_parser
+from known_urls import KnownUrls
+from ticker_extractor import extract_tickers
+from scrape_engine import get_engine, emit
+from metrics import DETAIL_FETCH_SECONDS, LISTING_FETCH_SECONDS, LISTING_ITEMS, PARSE_SECONDS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+ET = ZoneInfo("America/New_York")
+
+
 class NewsArticle:
-    def __init__(self, title, summary, url, published_date, published_time, tickers=None):
+    def __init__(self, title, summary, url, published_date=None, published_time=None, tickers=None,
+                 published_at=None):
+        # published_at is the timezone-aware source of truth; naive values and
+        # bare date/time pairs are wire-local Eastern time
+        if published_at is None and published_date is not None:
+            published_at = datetime.combine(published_date, published_time or dtime())
+        if published_at is not None:
+            if published_at.tzinfo is None:
+                published_at = published_at.replace(tzinfo=ET)
+            local = published_at.astimezone(ET)
+            published_date, published_time = local.date(), local.time()
         self.title = title
         self.summary = summary
         self.url = url
+        self.published_at = published_at
         self.published_date = published_date
         self.published_time = published_time
         self.tickers = tickers or []
@@ -30,12 +46,14 @@ class NewsArticle:
 
 
 class PRNewswireScraper:
+    SOURCE = "prnewswire"
     BASE_URL = (
         "https://www.prnewswire.com/news-releases/financial-services-latest-news/"
         "financial-services-latest-news-list/"
     )
 
-    def __init__(self, headers=None):
+    def __init__(self, headers=None, known_urls=None, engine=None):
+        self.engine = engine or get_engine()
         self.headers = headers or {
             "User-Agent": (
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -43,151 +61,181 @@ class PRNewswireScraper:
                 "Chrome/91.0.4472.124 Safari/537.36"
             )
         }
+        # URLs already stored in the DB (or recently rejected); their detail pages are not fetched
+        self.known_urls = known_urls if known_urls is not None else KnownUrls()
+
+    SELECTORS = [
+        'div.card.col-view',
+        'div.col-sm-8.col-lg-9.pull-left.card',
+        '.card-list-item',
+        '.news-release-item',
+        '.release-card',
+        '.news-card',
+    ]
 
     def get_latest_news(self, max_pages=1):
-        articles = []
-        page = 1
-        selectors = [
-            'div.card.col-view',
-            'div.col-sm-8.col-lg-9.pull-left.card',
-            '.card-list-item',
-            '.news-release-item',
-            '.release-card',
-            '.news-card',
+        return self.engine.run(self.fetch_latest_news(max_pages))
+
+    async def fetch_latest_news(self, max_pages=1, on_article=None):
+        """Scrape the listing; ``on_article`` receives each article as soon as it is parsed."""
+        # listing pages first, then every new detail page concurrently
+        listing_urls = [self.listing_url(page) for page in range(1, max_pages + 1)]
+        pages = await asyncio.gather(*(self._fetch_listing(page) for page in range(1, max_pages + 1)))
+        candidates = [c for page_items in pages for c in page_items]
+        results = await asyncio.gather(
+            *(self._fetch_item(*c, on_article=on_article) for c in candidates), return_exceptions=True
+        )
+        if any(isinstance(r, Exception) for r in results):
+            # re-parse next cycle even if the listing is unchanged, so failed items are retried
+            for url in listing_urls:
+                self.engine.forget_listing(url)
+        articles = [a for a in results if isinstance(a, NewsArticle)]
+
+        # sort newest first
+        articles.sort(key=lambda a: a.published_at, reverse=True)
+        logger.info(f"Scraped {len(articles)} articles")
+        return articles
+
+    async def discover(self, max_pages=1):
+        """Listing pass only: a fetch-queue job for every new detail page."""
+        pages = await asyncio.gather(*(self._fetch_listing(page) for page in range(1, max_pages + 1)))
+        return [
+            {"url": url, "title": title, "idx": idx}
+            for page_items in pages for idx, title, url in page_items
         ]
 
-        while page <= max_pages:
-            url = f"{self.BASE_URL}?page={page}&pagesize=100"
-            logger.info(f"Fetching PRNewswire page {page}: {url}")
-            try:
-                resp = requests.get(url, headers=self.headers, timeout=30)
-                resp.raise_for_status()
-            except Exception as e:
-                logger.error(f"Error fetching page {page}: {e}")
-                break
+    async def fetch_job(self, job, on_article=None):
+        """Fetch and parse one queued detail page; errors propagate so the job is retried."""
+        return await self._fetch_item(job.get("idx", 0), job["title"], job["url"], on_article=on_article)
 
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            items = []
-            for sel in selectors:
-                found = soup.select(sel)
-                if found:
-                    items = found
-                    logger.info(f"Using selector '{sel}' with {len(items)} items")
-                    break
-            if not items:
-                logger.warning(f"No news items found on page {page}")
+    def listing_url(self, page):
+        return f"{self.BASE_URL}?page={page}&pagesize=100"
+
+    async def _fetch_listing(self, page):
+        """Return (idx, title, url) for every not-yet-stored item on a listing page."""
+        url = self.listing_url(page)
+        logger.info(f"Fetching PRNewswire page {page}: {url}")
+        try:
+            with LISTING_FETCH_SECONDS.labels(self.SOURCE).time():
+                resp = await self.engine.get_listing(url, headers=self.headers)
+        except Exception as e:
+            logger.error(f"Error fetching page {page}: {e}")
+            return []
+        if resp is None:
+            logger.info(f"PRNewswire page {page} unchanged, skipping parse")
+            return []
+
+        parse_start = time.perf_counter()
+        doc = page_parser.parse(resp.text)
+        items = []
+        for sel in self.SELECTORS:
+            found = doc.select(sel)
+            if found:
+                items = found
+                logger.info(f"Using selector '{sel}' with {len(items)} items")
                 break
+        if not items:
+            logger.warning(f"No news items found on page {page}")
+            return []
 
-            for idx, item in enumerate(items, start=1):
-                try:
-                    h3 = item.find('h3')
-                    link = item.select_one('a.newsreleaseconsolidatelink')
-                    if not link or not link.get('href'):
-                        logger.warning(f"Item {idx} missing link, skipping")
-                        continue
-
-                    article_url = link['href']
-                    if not article_url.startswith('http'):
-                        article_url = f"https://www.prnewswire.com{article_url}"
-
-                    # parse publication timestamp
-                    pub_date, pub_time = self.extract_date_from_article(article_url)
-
-                    title = h3.get_text(strip=True) if h3 else 'No title'
-
-                    # fetch the body
-                    summary = self.get_article_content(article_url)
-                    if not summary:
-                        logger.warning(f"Item {idx} ('{title}') empty content, skipping")
-                        continue
-
-                    # extract tickers
-                    tickers = self.extract_tickers(summary)
-                    if not tickers:
-                        logger.info(f"Item {idx} ('{title}') has no valid tickers, skipping")
-                        continue
-
-                    # build and collect
-                    article = NewsArticle(
-                        title=title,
-                        summary=summary,
-                        url=article_url,
-                        published_date=pub_date,
-                        published_time=pub_time,
-                        tickers=tickers
-                    )
-                    articles.append(article)
-
-                    # memory cleanup
-                    del summary, article
-                    gc.collect()
-
-                except Exception as e:
-                    logger.error(f"Error parsing item {idx}: {e}")
+        candidates = []
+        skipped = 0
+        for idx, item in enumerate(items, start=1):
+            try:
+                h3 = item.select_one('h3')
+                link = item.select_one('a.newsreleaseconsolidatelink')
+                if not link or not link.get('href'):
+                    logger.warning(f"Item {idx} missing link, skipping")
                     continue
 
-            del soup, items, resp
-            gc.collect()
-            page += 1
-            tmod.sleep(1)
+                article_url = link['href']
+                if not article_url.startswith('http'):
+                    article_url = f"https://www.prnewswire.com{article_url}"
 
-        # sort newest first
-        articles.sort(key=lambda a: (a.published_date, a.published_time), reverse=True)
-        logger.info(f"Scraped {len(articles)} articles")
-        return articles
+                if article_url in self.known_urls:
+                    skipped += 1
+                    continue
 
-    def extract_date_from_article(self, url):
+                title = h3.text(strip=True) if h3 else 'No title'
+                candidates.append((idx, title, article_url))
+            except Exception as e:
+                logger.error(f"Error parsing item {idx}: {e}")
+
+        if skipped:
+            logger.info(f"Skipped {skipped} already-stored articles on page {page}")
+        PARSE_SECONDS.labels(self.SOURCE, "listing").observe(time.perf_counter() - parse_start)
+        LISTING_ITEMS.labels(self.SOURCE).inc(len(candidates))
+        return candidates
+
+    async def _fetch_item(self, idx, title, article_url, on_article=None):
+        try:
+            # one download gives us the timestamp and the body
+            published_at, summary = await self.fetch_article(article_url)
+            if not summary:
+                logger.warning(f"Item {idx} ('{title}') empty content, skipping")
+                self.known_urls.reject(article_url)
+                return None
+
+            # extract tickers
+            tickers = extract_tickers(summary)
+            if not tickers:
+                logger.info(f"Item {idx} ('{title}') has no valid tickers, skipping")
+                self.known_urls.reject(article_url)
+                return None
+
+            article = NewsArticle(
+                title=title,
+                summary=summary,
+                url=article_url,
+                tickers=tickers,
+                published_at=published_at
+            )
+        except Exception as e:
+            logger.error(f"Error parsing item {idx}: {e}")
+            raise
+        await emit(on_article, article)
+        return article
+
+    async def fetch_article(self, url):
+        """Download an article page once and return (published_at, body text)."""
+        with DETAIL_FETCH_SECONDS.labels(self.SOURCE).time():
+            resp = await self.engine.get(url, headers=self.headers)
+        resp.raise_for_status()
+        # parsing and trafilatura are CPU-bound; keep them off the engine's event loop
+        return await asyncio.to_thread(self._parse_article, resp, url)
+
+    def _parse_article(self, resp, url):
+        with PARSE_SECONDS.labels(self.SOURCE, "detail").time():
+            html = resp.text
+            doc = page_parser.parse(html)
+            return self.extract_date(doc, url), self.extract_content(html, doc)
+
+    def extract_date(self, doc, url=''):
         try:
-            resp = requests.get(url, headers=self.headers, timeout=30)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            meta_p = soup.select_one('p.mb-no')
+            meta_p = doc.select_one('p.mb-no')
             if meta_p:
-                ts = meta_p.get_text(strip=True).replace(' ET', '')
+                ts = meta_p.text(strip=True).replace(' ET', '')
                 dt = datetime.strptime(ts, '%b %d, %Y, %H:%M')
-                dt = dt.replace(tzinfo=ZoneInfo("America/New_York"))
-                return dt.date(), dt.time()
+                return dt.replace(tzinfo=ET)
         except Exception as e:
             logger.warning(f"Failed to extract date from article {url}: {e}")
 
+        return self._fallback_timestamp()
+
+    @staticmethod
+    def _fallback_timestamp():
         # fallback to “now”
-        now = datetime.now(ZoneInfo("America/New_York"))
-        return now.date(), now.time().replace(second=0, microsecond=0)
+        return datetime.now(ET).replace(second=0, microsecond=0)
 
-    def get_article_content(self, url):
-        # first try trafilatura
+    def extract_content(self, html, doc):
+        # first try trafilatura on the already-downloaded page
         try:
-            raw = trafilatura.fetch_url(url)
-            if raw:
-                text = trafilatura.extract(raw) or ''
-                if text:
-                    return text
+            text = trafilatura.extract(html) or ''
+            if text:
+                return text
         except Exception:
             pass
 
-        # fallback to BS4
-        try:
-            resp = requests.get(url, headers=self.headers, timeout=30)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            body = soup.select_one('.release-body')
-            return body.get_text(separator='\n', strip=True) if body else ''
-        except Exception:
-            return ''
-
-    def extract_tickers(self, text):
-        patterns = [
-            r'\b(?:NASDAQ|NYSE):\s*([A-Z][A-Z0-9\.]{1,10})',
-        ]
-        found = []
-        for pat in patterns:
-            found += re.findall(pat, text)
-        # dedupe + uppercase
-        seen = set()
-        tickers = []
-        for t in found:
-            t = t.upper().strip()
-            if t not in seen:
-                seen.add(t)
-                tickers.append(t)
-        return tickers
\ No newline at end of file
+        # fallback to the parsed page
+        body = doc.select_one('.release-body')
+        return body.text(separator='\n', strip=True) if body else ''
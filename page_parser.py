@@ -0,0 +1,286 @@
+"""
+HTML parsing for the scrapers, with a choice of backend.
+
+``parse(html)`` returns a document node with a small BeautifulSoup-like API
+(``select``, ``select_one``, ``text``, ``get``) that is the same whatever
+backend built it:
+
+* ``lxml`` (default): libxml2's HTML parser. CSS selectors are translated to
+  compiled XPath once and cached.
+* ``selectolax``: the Modest engine, if the package is installed.
+* ``html.parser``: BeautifulSoup with the stdlib parser, i.e. what the
+  scrapers used before. Kept as the fallback.
+
+The backend comes from the HTML_PARSER environment variable. An unknown or
+uninstalled backend falls back to ``html.parser`` with a warning.
+"""
+import html as html_lib
+import logging
+import os
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BACKENDS = ("lxml", "selectolax", "html.parser")
+DEFAULT_BACKEND = "lxml"
+
+# text inside these never counts as page text (BeautifulSoup's get_text skips it too)
+_NON_TEXT = frozenset(("script", "style", "template"))
+
+
+# -- BeautifulSoup (fallback) ------------------------------------------------
+class SoupNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [SoupNode(el) for el in self.el.select(css)]
+
+    def select_one(self, css):
+        el = self.el.select_one(css)
+        return SoupNode(el) if el is not None else None
+
+    def text(self, separator="", strip=False):
+        return self.el.get_text(separator=separator, strip=strip)
+
+    def get(self, name, default=None):
+        value = self.el.get(name, default)
+        return " ".join(value) if isinstance(value, list) else value
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+
+def _parse_soup(markup):
+    from bs4 import BeautifulSoup
+    return SoupNode(BeautifulSoup(markup, "html.parser"))
+
+
+# -- lxml --------------------------------------------------------------------
+_CSS_TOKEN = re.compile(r"""
+    \s*(?P<child>>)\s*
+  | \s*(?P<comma>,)\s*
+  | (?P<space>\s+)
+  | (?P<type>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w-]+)\s*
+      (?:(?P<op>[~^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+))\s*)?
+    \]
+""", re.X)
+
+
+def _literal(value):
+    return f"'{value}'" if "'" not in value else f'"{value}"'
+
+
+def _token_match(attr, value):
+    return f"contains(concat(' ', normalize-space({attr}), ' '), {_literal(' ' + value + ' ')})"
+
+
+def _attr_predicate(m):
+    attr, op = "@" + m.group("attr"), m.group("op")
+    if op is None:
+        return f"[{attr}]"
+    value = next(v for v in (m.group("dq"), m.group("sq"), m.group("bare")) if v is not None)
+    lit = _literal(value)
+    if op == "=":
+        return f"[{attr}={lit}]"
+    if op == "~=":
+        return f"[{_token_match(attr, value)}]"
+    if op == "^=":
+        return f"[starts-with({attr}, {lit})]"
+    if op == "*=":
+        return f"[contains({attr}, {lit})]"
+    return f"[substring({attr}, string-length({attr}) - {len(value) - 1})={lit}]"  # $=
+
+
+@lru_cache(maxsize=None)
+def css_to_xpath(css):
+    """Translate the CSS subset the scrapers use into a relative XPath expression.
+
+    Supports type, ``*``, ``#id``, ``.class`` and ``[attr]``/``[attr=|~=|^=|$=|*=value]``
+    selectors, descendant and ``>`` combinators and ``,`` groups.
+    """
+    paths, steps, compound, axis = [], [], "", "descendant::"
+    css, pos = css.strip(), 0
+    while pos < len(css):
+        m = _CSS_TOKEN.match(css, pos)
+        if not m:
+            raise ValueError(f"Unsupported CSS selector {css!r} at {pos}")
+        pos = m.end()
+        if m.group("type"):
+            if compound:
+                raise ValueError(f"Unsupported CSS selector {css!r}")
+            compound = m.group("type")
+        elif m.group("id"):
+            compound = (compound or "*") + f"[@id={_literal(m.group('id'))}]"
+        elif m.group("cls"):
+            compound = (compound or "*") + f"[{_token_match('@class', m.group('cls'))}]"
+        elif m.group("attr"):
+            compound = (compound or "*") + _attr_predicate(m)
+        else:
+            if not compound:
+                raise ValueError(f"Unsupported CSS selector {css!r}")
+            steps.append(axis + compound)
+            compound = ""
+            if m.group("comma"):
+                paths.append("".join(steps))
+                steps, axis = [], "descendant::"
+            else:
+                axis = "/" if m.group("child") else "/descendant::"
+    if not compound:
+        raise ValueError(f"Unsupported CSS selector {css!r}")
+    steps.append(axis + compound)
+    paths.append("".join(steps))
+    return " | ".join(paths)
+
+
+@lru_cache(maxsize=None)
+def _compiled(css):
+    from lxml import etree
+    return etree.XPath(css_to_xpath(css))
+
+
+def _lxml_strings(el):
+    if isinstance(el.tag, str) and el.tag not in _NON_TEXT and el.text:
+        yield el.text
+    for child in el:
+        yield from _lxml_strings(child)
+        if child.tail:
+            yield child.tail
+
+
+class LxmlNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [LxmlNode(el) for el in _compiled(css)(self.el)]
+
+    def select_one(self, css):
+        found = _compiled(css)(self.el)
+        return LxmlNode(found[0]) if found else None
+
+    def text(self, separator="", strip=False):
+        strings = _lxml_strings(self.el)
+        if strip:
+            return separator.join(s for s in (s.strip() for s in strings) if s)
+        return separator.join(strings)
+
+    def get(self, name, default=None):
+        return self.el.get(name, default)
+
+    def __getitem__(self, name):
+        value = self.el.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+
+def _parse_lxml(markup):
+    import lxml.html
+    from lxml import etree
+    try:
+        return LxmlNode(lxml.html.document_fromstring(markup))
+    except ValueError:
+        # str input with an XML encoding declaration
+        return LxmlNode(lxml.html.document_fromstring(markup.encode("utf-8")))
+    except etree.ParserError:
+        # empty or whitespace-only document
+        return LxmlNode(lxml.html.Element("html"))
+
+
+# -- selectolax -------------------------------------------------------------
+class LexborNode:
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def select(self, css):
+        return [LexborNode(el) for el in self.el.css(css)]
+
+    def select_one(self, css):
+        el = self.el.css_first(css)
+        return LexborNode(el) if el is not None else None
+
+    def text(self, separator="", strip=False):
+        return self.el.text(deep=True, separator=separator, strip=strip)
+
+    def get(self, name, default=None):
+        value = self.el.attributes.get(name)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        value = self.el.attributes.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+
+def _parse_selectolax(markup):
+    from selectolax.parser import HTMLParser
+    tree = HTMLParser(markup)
+    tree.strip_tags(list(_NON_TEXT))
+    return LexborNode(tree.root if tree.root is not None else HTMLParser("<html></html>").root)
+
+
+_PARSERS = {"lxml": _parse_lxml, "selectolax": _parse_selectolax, "html.parser": _parse_soup}
+_MODULES = {"lxml": "lxml.html", "selectolax": "selectolax.parser", "html.parser": "bs4"}
+
+
+def _available(name):
+    try:
+        __import__(_MODULES[name])
+        return True
+    except ImportError:
+        return False
+
+
+def set_backend(name):
+    """Switch the process-wide backend; returns the one actually in use."""
+    global BACKEND
+    if name not in _PARSERS:
+        logger.warning(f"Unknown HTML_PARSER '{name}', using html.parser")
+        name = "html.parser"
+    elif not _available(name):
+        logger.warning(f"HTML parser backend '{name}' is not installed, using html.parser")
+        name = "html.parser"
+    BACKEND = name
+    return BACKEND
+
+
+BACKEND = set_backend(os.getenv("HTML_PARSER", DEFAULT_BACKEND))
+
+
+def parse(markup, backend=None):
+    """Parse an HTML document (or fragment) with the configured backend."""
+    return _PARSERS[backend or BACKEND](markup or "")
+
+
+_SKIPPED_BLOCKS = re.compile(r"<(script|style|template)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_TAG = re.compile(r"""<(?:[^>"']|"[^"]*"|'[^']*')*>""")
+
+
+def page_text(markup, separator=" "):
+    """All visible text of a page, for callers that only regex over it.
+
+    Equivalent to ``get_text(separator=separator, strip=True)`` on a parsed
+    page but needs no tree: tags are cut out with a regex. With the
+    ``html.parser`` backend the page is parsed as before.
+    """
+    if BACKEND == "html.parser":
+        return parse(markup).text(separator=separator, strip=True)
+    text = _TAG.sub("\0", _SKIPPED_BLOCKS.sub("\0", markup or ""))
+    parts = (part.strip() for part in html_lib.unescape(text).split("\0"))
+    return separator.join(part for part in parts if part)
@@ -2,162 +2,508 @@
 Module for PostgreSQL database operations to store and retrieve news articles.
 """
 import logging
-from datetime import datetime
-from models import db, Article, Ticker, FloatData
-from news_scraper import NewsArticle
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import load_only
+from events import publish_articles
+from known_urls import KnownUrls
+from metrics import DB_WRITE_SECONDS, PUBLISH_LAG_SECONDS
+from models import db, Article, Ticker, FloatData, ScraperState, UserWatchlist, article_tickers
+from news_scraper import NewsArticle, ET
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_number(value):
+    """Numeric value for the float_data columns; 'N/A' and friends become NULL."""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 
 class NewsDatabase:
     """Class to handle saving and loading news articles and float data."""
 
+    # article ids are assigned at INSERT, not at commit, so a batch can commit
+    # an id lower than one a watchlist client has already moved past; rows that
+    # close behind the cursor and this recent are sent again
+    WATCHLIST_RESCAN_IDS = 1000
+    WATCHLIST_RESCAN_SECONDS = 300
+
     def __init__(self):
+        self.known_urls = KnownUrls()
+        self._ticker_lock = threading.Lock()
+        self._ticker_cache = {}  # symbol -> tickers.id
         logger.info("NewsDatabase initialized")
 
+    def load_known_urls(self):
+        """Seed the known-URL set from ``articles.url``. Needs an app context."""
+        try:
+            rows = db.session.query(Article.url).all()
+            self.known_urls.seed(url for (url,) in rows)
+            logger.info(f"Loaded {len(self.known_urls)} known article URLs")
+        except Exception as e:
+            logger.error(f"Error loading known article URLs: {e}")
+
     def get_articles_by_ticker(self, ticker, limit=1):
         articles = (
             Article.query.join(Article.tickers)
             .filter(Ticker.symbol == ticker)
-            .order_by(Article.published_date.desc(), Article.published_time.desc())
+            .order_by(Article.published_at.desc(), Article.id.desc())
             .limit(limit)
             .all()
         )
         return articles
 
-    def save_article(self, article: NewsArticle):
+    def get_watchlist_updates(self, since_id, limit=50):
+        """Articles with id > ``since_id`` that mention any watchlist ticker.
+
+        Also re-sends recently created ones up to WATCHLIST_RESCAN_IDS behind
+        the cursor, which may have committed after the client last asked;
+        clients skip ids they have already seen. New articles and the rescan
+        are picked separately, each capped at ``limit`` articles, so re-sent
+        rows never crowd out new ones. Each watched ticker is an index range
+        scan on ix_article_tickers_ticker_article (ticker_id, article_id).
+        Returns dicts oldest first, each with the matching watched tickers.
+        """
+        recent = datetime.utcnow() - timedelta(seconds=self.WATCHLIST_RESCAN_SECONDS)
         try:
-            existing = Article.query.filter_by(url=article.url).first()
-            if existing:
-                logger.info(f"Article already exists: {article.url}")
-                return existing.id
-
-            new_article = Article(
-                title=article.title,
-                summary=article.summary,
-                url=article.url,
-                published_date=article.published_date,
-                published_time=article.published_time
+            new_ids = self._watchlist_article_ids(
+                article_tickers.c.article_id > since_id,
+                order=article_tickers.c.article_id,
+                limit=limit,
             )
+            # nearest the cursor first: the likeliest to have committed late
+            rescan_ids = self._watchlist_article_ids(
+                article_tickers.c.article_id > since_id - self.WATCHLIST_RESCAN_IDS,
+                article_tickers.c.article_id <= since_id,
+                Article.created_at >= recent,
+                order=article_tickers.c.article_id.desc(),
+                limit=limit,
+            )
+            if not new_ids and not rescan_ids:
+                return []
+            rows = (
+                self._watchlist_query(
+                    Article.id, Article.title, Article.published_date,
+                    Article.published_time, Ticker.symbol
+                )
+                .filter(article_tickers.c.article_id.in_(new_ids + rescan_ids))
+                .order_by(Article.id)
+                .all()
+            )
+        except Exception as e:
+            logger.error(f"Error getting watchlist updates since {since_id}: {e}")
+            return []
 
-            # Add tickers
-            for sym in article.tickers:
-                ticker = Ticker.query.filter_by(symbol=sym).first()
-                if not ticker:
-                    ticker = Ticker(symbol=sym)
-                    db.session.add(ticker)
-                    db.session.flush()
-                new_article.tickers.append(ticker)
-
-            db.session.add(new_article)
-            db.session.flush()  # Flush before committing
-            logger.info(f"✅ Article staged: {new_article.url}")
-
-            # Save float data if available
-            if article.float_data:
-                for sym, data in article.float_data.items():
-                    if data:  # Only if data is non-empty
-                        self.update_float_data(sym, data)
+        updates = {}
+        for article_id, title, pub_date, pub_time, symbol in rows:
+            item = updates.setdefault(article_id, {
+                "id": article_id,
+                "title": title,
+                "published": f"{pub_date} {pub_time}",
+                "tickers": [],
+            })
+            item["tickers"].append(symbol)
+        return list(updates.values())
 
-            db.session.commit()
-            logger.info(f"✅ Article saved with ID {new_article.id}")
+    def _watchlist_query(self, *columns):
+        return (
+            db.session.query(*columns)
+            .select_from(UserWatchlist)
+            .join(Ticker, Ticker.symbol == UserWatchlist.ticker_symbol)
+            .join(article_tickers, article_tickers.c.ticker_id == Ticker.id)
+            .join(Article, Article.id == article_tickers.c.article_id)
+        )
 
-            return new_article.id
+    def _watchlist_article_ids(self, *conditions, order, limit):
+        """Ids of up to ``limit`` articles matching a watched ticker and ``conditions``."""
+        rows = (
+            self._watchlist_query(article_tickers.c.article_id)
+            .filter(*conditions)
+            .distinct()
+            .order_by(order)
+            .limit(limit)
+            .all()
+        )
+        return [article_id for article_id, in rows]
+
+    def latest_article_id(self):
+        """Highest article id, used as the starting watchlist cursor."""
+        return db.session.query(db.func.max(Article.id)).scalar() or 0
+
+    def save_article(self, article: NewsArticle):
+        """Save one article; returns its new id, or None if it was not stored."""
+        inserted, _ = self.save_articles([article])
+        return inserted.get(article.url)
 
+    def save_articles(self, articles):
+        """Insert a batch of articles, one transaction per batch.
+
+        Articles go in with ``ON CONFLICT (url) DO NOTHING``, so a URL that is
+        already stored -- or is being stored concurrently by another process --
+        is skipped rather than raising. Tickers, ``article_tickers`` links and
+        float data are written set-based for the newly inserted rows only. If the
+        batch fails it is split in halves and retried, so one bad article does
+        not take the rest down with it. Returns ``(inserted, failed)``: ``{url:
+        id}`` for the articles this call inserted and the set of URLs that could
+        not be saved.
+        """
+        batch = {}
+        for art in articles:
+            batch.setdefault(art.url, art)
+        inserted, failed = {}, set()
+        if not batch:
+            return inserted, failed
+
+        write_start = time.perf_counter()
+        try:
+            self._save_chunk(batch, inserted, failed)
+        finally:
+            DB_WRITE_SECONDS.labels("save_articles").observe(time.perf_counter() - write_start)
+
+        stored_at = datetime.now(timezone.utc)
+        for url in inserted:
+            PUBLISH_LAG_SECONDS.observe((stored_at - batch[url].published_at).total_seconds())
+        logger.info(
+            f"✅ Saved {len(inserted)}/{len(batch)} articles "
+            f"({len(batch) - len(inserted) - len(failed)} already stored, {len(failed)} failed)"
+        )
+        return inserted, failed
+
+    def _save_chunk(self, batch, inserted, failed):
+        """Save ``batch`` in one transaction; on failure retry it in halves."""
+        try:
+            rows, new_tickers = self._insert_articles(batch)
+            db.session.commit()
         except Exception as e:
-            logger.error(f"❌ Error saving article '{article.url}': {e}", exc_info=True)
             db.session.rollback()
-            return None
+            # a cached id may point at a ticker deleted elsewhere; re-resolve next time
+            with self._ticker_lock:
+                self._ticker_cache.clear()
+            if len(batch) == 1 or isinstance(e, OperationalError):
+                # a single bad row, or the database itself is unavailable
+                logger.error(f"❌ Error saving batch of {len(batch)} articles: {e}", exc_info=True)
+                failed.update(batch)
+                return
+            logger.warning(f"⚠️ Batch of {len(batch)} articles failed, retrying in halves: {e}")
+            urls = sorted(batch)
+            half = len(urls) // 2
+            for part in (urls[:half], urls[half:]):
+                self._save_chunk({url: batch[url] for url in part}, inserted, failed)
+            return
+
+        # only cache ids that survived the commit
+        with self._ticker_lock:
+            self._ticker_cache.update(new_tickers)
+        for url in batch:
+            self.known_urls.add(url)
+        inserted.update(rows)
+
+    def _insert_articles(self, batch):
+        """Write ``batch`` into the open transaction; returns ``({url: id}, new ticker ids)``."""
+        # sorted so concurrent batches take row locks in the same order
+        urls = sorted(batch)
+        now = datetime.utcnow()
+        stmt = (
+            pg_insert(Article.__table__)
+            .values([
+                {
+                    'title': batch[url].title,
+                    'summary': batch[url].summary,
+                    'url': url,
+                    'published_at': batch[url].published_at,
+                    'published_date': batch[url].published_date,
+                    'published_time': batch[url].published_time,
+                    'created_at': now,
+                }
+                for url in urls
+            ])
+            .on_conflict_do_nothing(index_elements=['url'])
+            .returning(Article.__table__.c.url, Article.__table__.c.id)
+        )
+        inserted = dict(db.session.execute(stmt).all())
+        if not inserted:
+            return inserted, {}
+
+        symbols = {sym for url in inserted for sym in batch[url].tickers}
+        ticker_ids, new_tickers = self._ticker_ids(symbols)
+        links = [
+            {'article_id': article_id, 'ticker_id': ticker_ids[sym]}
+            for url, article_id in inserted.items()
+            for sym in dict.fromkeys(batch[url].tickers)
+        ]
+        if links:
+            db.session.execute(
+                pg_insert(article_tickers).values(links).on_conflict_do_nothing()
+            )
+
+        # float data for every symbol of the new articles, same transaction
+        float_rows = {
+            sym: data
+            for url in inserted
+            for sym, data in (batch[url].float_data or {}).items()
+            if data and sym in ticker_ids
+        }
+        if float_rows:
+            self._upsert_float_rows(float_rows)
+
+        # delivered to the web workers when this transaction commits
+        publish_articles(inserted.values())
+        return inserted, new_tickers
+
+    def _ticker_ids(self, symbols):
+        """Resolve symbols to ids, upserting unknown ones inside the current transaction.
+
+        Returns ``(ids, new)``: all requested ids, and the ones not yet in the
+        symbol cache (the caller adds those after committing).
+        """
+        with self._ticker_lock:
+            ids = {s: self._ticker_cache[s] for s in symbols if s in self._ticker_cache}
+        missing = sorted(set(symbols) - ids.keys())
+        if not missing:
+            return ids, {}
+
+        tickers = Ticker.__table__
+        db.session.execute(
+            pg_insert(tickers)
+            .values([{'symbol': s} for s in missing])
+            .on_conflict_do_nothing(index_elements=['symbol'])
+        )
+        # DO NOTHING returns no row for symbols that already existed, so select them all back
+        rows = db.session.execute(
+            db.select(tickers.c.symbol, tickers.c.id).where(tickers.c.symbol.in_(missing))
+        ).all()
+        new = dict(rows)
+        ids.update(new)
+        return ids, new
+
+    @staticmethod
+    def encode_cursor(article):
+        """Opaque ``?before=`` cursor pointing just past ``article``."""
+        micros = (article.published_at - _EPOCH) // timedelta(microseconds=1)
+        return f"{micros}_{article.id}"
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+        micros, article_id = cursor.split('_')
+        article_id = int(article_id)
+        # articles.id is a 32-bit integer
+        if not 0 < article_id < 2 ** 31:
+            raise ValueError(f"article id out of range: {article_id}")
+        try:
+            return _EPOCH + timedelta(microseconds=int(micros)), article_id
+        except OverflowError as e:
+            raise ValueError(f"timestamp out of range: {micros}") from e
+
+    def get_recent_articles(self, page=1, page_size=100, float_op=None, float_val=None, before=None):
+        """Page of articles, optionally limited to those with a ticker whose float
+        is below ('lt') or above ('gt') ``float_val`` million shares.
 
-    def get_recent_articles(self, page=1, page_size=100):
+        With ``before`` (a decoded cursor) the page seeks on (published_at, id)
+        instead of using OFFSET, so deep pages cost the same as the first one.
+        Only the columns covered by ix_articles_published_at are loaded.
+        """
         try:
             offset = (page - 1) * page_size
-            records = (
-                db.session.query(Article)
-                .order_by(
-                    Article.published_date.desc(),
-                    Article.published_time.desc()
+            query = db.session.query(Article).options(
+                load_only(Article.id, Article.title, Article.url, Article.published_at)
+            )
+            if before is not None:
+                offset = 0
+                query = query.filter(db.tuple_(Article.published_at, Article.id) < before)
+            if float_val is not None:
+                threshold = float_val * 1_000_000
+                cond = FloatData.float_shares > threshold if float_op == 'gt' else FloatData.float_shares < threshold
+                query = query.filter(
+                    db.session.query(article_tickers.c.article_id)
+                    .join(Ticker, Ticker.id == article_tickers.c.ticker_id)
+                    .join(FloatData, FloatData.ticker_symbol == Ticker.symbol)
+                    .filter(article_tickers.c.article_id == Article.id, cond)
+                    .exists()
                 )
+            records = (
+                query
+                .order_by(Article.published_at.desc(), Article.id.desc())
                 .offset(offset)
                 .limit(page_size)
                 .all()
             )
 
-            result = []
-            for art in records:
-                obj = ArticleObject(
-                    title=art.title,
-                    summary=art.summary,
-                    url=art.url,
-                    published_date=art.published_date,
-                    published_time=art.published_time,
-                    tickers=[t.symbol for t in art.tickers]
-                )
-                obj.id = art.id
-                float_map = {}
-                for sym in obj.tickers:
-                    fd = FloatData.query.filter_by(ticker_symbol=sym).first()
-                    if fd:
-                        float_map[sym] = fd.to_dict()
-                obj.float_data = float_map
-                result.append(obj)
-
-            return result
+            return self._to_article_objects(records)
         except Exception as e:
             logger.error(f"Error getting recent articles: {e}")
             return []
 
+    def get_articles_by_ids(self, ids):
+        """Article objects for ``ids`` (list-view columns), newest first."""
+        if not ids:
+            return []
+        try:
+            records = (
+                db.session.query(Article)
+                .options(load_only(Article.id, Article.title, Article.url, Article.published_at))
+                .filter(Article.id.in_(ids))
+                .order_by(Article.published_at.desc(), Article.id.desc())
+                .all()
+            )
+            return self._to_article_objects(records)
+        except Exception as e:
+            logger.error(f"Error getting articles by id: {e}")
+            return []
+
+    def _to_article_objects(self, records):
+        """Attach tickers and float data to a page of articles in two queries total."""
+        ids = [art.id for art in records]
+        symbols_by_article = {}
+        if ids:
+            rows = (
+                db.session.query(article_tickers.c.article_id, Ticker.symbol)
+                .join(Ticker, Ticker.id == article_tickers.c.ticker_id)
+                .filter(article_tickers.c.article_id.in_(ids))
+                .all()
+            )
+            for article_id, symbol in rows:
+                symbols_by_article.setdefault(article_id, []).append(symbol)
+
+        float_by_symbol = self._float_data_for(
+            {sym for syms in symbols_by_article.values() for sym in syms}
+        )
+
+        result = []
+        for art in records:
+            obj = ArticleObject(
+                title=art.title,
+                summary=None,
+                url=art.url,
+                published_at=art.published_at,
+                tickers=symbols_by_article.get(art.id, [])
+            )
+            obj.id = art.id
+            obj.float_data = {sym: float_by_symbol[sym] for sym in obj.tickers if sym in float_by_symbol}
+            result.append(obj)
+        return result
+
+    def _float_data_for(self, symbols):
+        if not symbols:
+            return {}
+        rows = FloatData.query.filter(FloatData.ticker_symbol.in_(list(symbols))).all()
+        return {fd.ticker_symbol: fd.to_dict() for fd in rows}
+
     def get_article_by_id(self, article_id):
         try:
-            art = Article.query.get(article_id)
+            art = db.session.get(Article, article_id)
             if not art:
                 return None
             d = art.to_dict()
-            float_map = {}
-            for sym in d['tickers']:
-                fd = FloatData.query.filter_by(ticker_symbol=sym).first()
-                if fd:
-                    float_map[sym] = fd.to_dict()
-            d['float_data'] = float_map
+            float_map = self._float_data_for(d['tickers'])
+            d['float_data'] = {sym: float_map[sym] for sym in d['tickers'] if sym in float_map}
             return d
         except Exception as e:
             logger.error(f"Error fetching article {article_id}: {e}")
             return None
 
+    def load_float_data(self, symbols):
+        """Return {symbol: (float data dict, updated_at)} for stored symbols.
+
+        Ends its read transaction before returning: the pipeline's enrich threads
+        keep one session for their lifetime, and an open transaction would sit
+        idle on a connection, hold a lock on float_data and serve stale rows
+        from the identity map.
+        """
+        try:
+            rows = FloatData.query.filter(FloatData.ticker_symbol.in_(list(symbols))).all()
+            return {
+                fd.ticker_symbol: (dict(fd.to_dict(), updated_at=fd.updated_at), fd.updated_at)
+                for fd in rows
+            }
+        except Exception as e:
+            logger.error(f"Error loading cached float data: {e}")
+            return {}
+        finally:
+            db.session.rollback()
+
     def update_float_data(self, ticker_symbol, float_data):
+        return self.upsert_float_data({ticker_symbol: float_data})
+
+    def upsert_float_data(self, mapping):
+        """Write ``{symbol: float dict}`` in one statement and one commit."""
+        mapping = {sym: data for sym, data in mapping.items() if data}
+        if not mapping:
+            return True
         try:
-            ticker = Ticker.query.filter_by(symbol=ticker_symbol).first()
-            if not ticker:
-                ticker = Ticker(symbol=ticker_symbol)
-                db.session.add(ticker)
-                db.session.flush()
-
-            fd = FloatData.query.filter_by(ticker_symbol=ticker_symbol).first()
-            if not fd:
-                fd = FloatData(
-                    ticker_id=ticker.id,
-                    ticker_symbol=ticker_symbol,
-                    company_name=float_data.get('name'),
-                    float_value=float_data.get('float'),
-                    price=float_data.get('price'),
-                    market_cap=float_data.get('market_cap')
-                )
-                db.session.add(fd)
-            else:
-                fd.company_name = float_data.get('name')
-                fd.float_value = float_data.get('float')
-                fd.price = float_data.get('price')
-                fd.market_cap = float_data.get('market_cap')
-                fd.updated_at = datetime.utcnow()
+            with DB_WRITE_SECONDS.labels("upsert_float_data").time():
+                _, new_tickers = self._ticker_ids(mapping.keys())
+                self._upsert_float_rows(mapping)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating float data for {sorted(mapping)}: {e}")
+            return False
+        with self._ticker_lock:
+            self._ticker_cache.update(new_tickers)
+        logger.debug(f"Float data updated for {len(mapping)} symbols")
+        return True
+
+    def _upsert_float_rows(self, mapping):
+        """INSERT ... ON CONFLICT (ticker_symbol) DO UPDATE inside the caller's transaction.
 
+        The tickers rows must already exist (float_data references tickers.symbol).
+        A stored row fetched more recently than the incoming data is left alone.
+        """
+        now = datetime.utcnow()
+        stmt = pg_insert(FloatData.__table__).values([
+            {
+                'ticker_symbol': sym,
+                'company_name': data.get('name'),
+                'float_value': data.get('float'),
+                'float_shares': _as_number(data.get('float_raw')),
+                'price': _as_number(data.get('price')),
+                'market_cap': _as_number(data.get('market_cap_raw')),
+                # keep the time the data was fetched so cached copies don't look fresh
+                'updated_at': data.get('updated_at') or now,
+            }
+            # sorted so concurrent upserts lock rows in the same order
+            for sym, data in sorted(mapping.items())
+        ])
+        cols = ('company_name', 'float_value', 'float_shares', 'price', 'market_cap', 'updated_at')
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['ticker_symbol'],
+            set_={c: stmt.excluded[c] for c in cols},
+            where=db.or_(
+                FloatData.__table__.c.updated_at.is_(None),
+                FloatData.__table__.c.updated_at <= stmt.excluded.updated_at,
+            ),
+        ))
+
+    def get_state(self, key, default=None):
+        try:
+            row = db.session.get(ScraperState, key)
+            return row.value if row else default
+        except Exception as e:
+            logger.error(f"Error reading scraper state '{key}': {e}")
+            return default
+
+    def set_state(self, key, value):
+        try:
+            row = db.session.get(ScraperState, key)
+            if row:
+                row.value = value
+            else:
+                db.session.add(ScraperState(key=key, value=value))
             db.session.commit()
-            logger.debug(f"Float data updated for {ticker_symbol}")
             return True
-
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error updating float data for {ticker_symbol}: {e}")
+            logger.error(f"Error saving scraper state '{key}': {e}")
             return False
 
     def clear_articles(self):
@@ -166,6 +512,9 @@ class NewsDatabase:
             db.session.query(Ticker).delete()
             db.session.query(FloatData).delete()
             db.session.commit()
+            self.known_urls.clear()
+            with self._ticker_lock:
+                self._ticker_cache.clear()
             logger.info("All articles, tickers, and float data cleared.")
         except Exception as e:
             db.session.rollback()
@@ -174,12 +523,26 @@ class NewsDatabase:
 
 
 class ArticleObject:
-    def __init__(self, title, summary, url, published_date, published_time, tickers=None):
+    def __init__(self, title, summary, url, published_at, tickers=None):
+        local = published_at.astimezone(ET) if published_at else None
         self.title = title
         self.summary = summary
         self.url = url
-        self.published_date = published_date
-        self.published_time = published_time
+        self.published_at = published_at
+        self.published_date = local.date() if local else None
+        self.published_time = local.time() if local else None
         self.tickers = tickers or []
         self.float_data = {}
         self.id = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'url': self.url,
+            'published_date': self.published_date.strftime('%Y-%m-%d') if self.published_date else '',
+            'published_time': self.published_time.strftime('%H:%M') if self.published_time else '',
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'tickers': self.tickers,
+            'float_data': self.float_data
+        }
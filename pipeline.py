@@ -0,0 +1,188 @@
+"""
+Streaming ingestion pipeline used by the background monitor.
+
+Articles flow scrape -> tickers -> float enrichment -> persist through bounded
+queues, so each one reaches the DB as soon as its own float data is in rather
+than waiting for the slowest source or yfinance lookup of the cycle. A full
+queue blocks the stage in front of it, which throttles the scrapers. The
+persist stage writes whatever has queued up since its last write as one batch.
+
+Every submitted article ends in exactly one outcome, reported to the optional
+``on_done(article, outcome)`` given to ``submit``: SAVED, SKIPPED (permanently:
+no tickers, no float data, or already stored) or FAILED (transient, e.g. the
+batch write rolled back), so callers can retry only what is worth retrying.
+"""
+import logging
+import queue
+import threading
+from metrics import PIPELINE_ARTICLES
+from models import db
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_STOP = object()
+
+SAVED = "saved"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class IngestPipeline:
+    """Long-lived stage threads connected by bounded queues."""
+
+    def __init__(self, app, database, stock_fetcher, queue_size=50, enrich_workers=5,
+                 enrich_batch=20, persist_batch=50, on_saved=None):
+        self.app = app
+        self.database = database
+        self.stock_fetcher = stock_fetcher
+        self.enrich_workers = enrich_workers
+        self.enrich_batch = enrich_batch
+        self.persist_batch = persist_batch
+        self.on_saved = on_saved
+        self.tickers_q = queue.Queue(maxsize=queue_size)
+        self.enrich_q = queue.Queue(maxsize=queue_size)
+        self.persist_q = queue.Queue(maxsize=queue_size)
+        self._threads = []
+
+    # -- lifecycle --------------------------------------------------------
+    def start(self):
+        if self._threads:
+            return
+        specs = [("tickers", self._ticker_stage)]
+        specs += [(f"enrich-{i}", self._enrich_stage) for i in range(self.enrich_workers)]
+        specs += [("persist", self._persist_stage)]
+        for name, target in specs:
+            t = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"Ingest pipeline started with {len(self._threads)} stage threads")
+
+    def stop(self):
+        self.tickers_q.put(_STOP)
+
+    def submit(self, article, on_done=None):
+        """Feed one scraped article in; blocks while the pipeline is saturated.
+
+        ``on_done(article, outcome)`` is called from a stage thread, inside an
+        app context, once the article has been saved, skipped or has failed.
+        """
+        PIPELINE_ARTICLES.labels("scraped").inc()
+        self.tickers_q.put((article, on_done))
+
+    # -- stages -----------------------------------------------------------
+    def _finish(self, item, outcome):
+        art, on_done = item
+        PIPELINE_ARTICLES.labels(outcome).inc()
+        try:
+            if outcome == SAVED and self.on_saved:
+                self.on_saved(art)
+            if on_done:
+                on_done(art, outcome)
+        except Exception as e:
+            logger.error(f"[Pipeline] Outcome callback failed for {art.url}: {e}")
+
+    def _ticker_stage(self):
+        # app context for outcome callbacks that write to the DB
+        with self.app.app_context():
+            while True:
+                item = self.tickers_q.get()
+                try:
+                    if item is _STOP:
+                        for _ in range(self.enrich_workers):
+                            self.enrich_q.put(_STOP)
+                        return
+                    art = item[0]
+                    art.tickers = list(dict.fromkeys(t.upper().strip() for t in art.tickers if t))
+                    if art.url in self.database.known_urls:
+                        self._finish(item, SKIPPED)
+                        continue
+                    if not art.tickers:
+                        self.database.known_urls.reject(art.url)
+                        self._finish(item, SKIPPED)
+                        continue
+                    self.enrich_q.put(item)
+                except Exception as e:
+                    logger.error(f"[Pipeline] Ticker stage failed for {item[0].url}: {e}")
+                    self._finish(item, FAILED)
+                finally:
+                    self.tickers_q.task_done()
+
+    def _enrich_stage(self):
+        # app context so the float cache can fall back to the float_data table
+        with self.app.app_context():
+            while True:
+                # block for one article, then take whatever else is already
+                # queued, so a burst shares one batched quote lookup
+                items = [self.enrich_q.get()]
+                while items[-1] is not _STOP and len(items) < self.enrich_batch:
+                    try:
+                        items.append(self.enrich_q.get_nowait())
+                    except queue.Empty:
+                        break
+                batch = [item for item in items if item is not _STOP]
+                try:
+                    if batch:
+                        self._enrich(batch)
+                except Exception as e:
+                    logger.error(f"[Pipeline] Float enrichment failed for batch of {len(batch)}: {e}")
+                    for item in batch:
+                        self._finish(item, FAILED)
+                finally:
+                    # hand the connection back between batches instead of idling in a transaction
+                    db.session.remove()
+                    for _ in items:
+                        self.enrich_q.task_done()
+                if len(batch) < len(items):
+                    self.persist_q.put(_STOP)
+                    return
+
+    def _enrich(self, batch):
+        float_data = self.stock_fetcher.get_batch_float_data(
+            list(dict.fromkeys(t for art, _ in batch for t in art.tickers))
+        )
+        for item in batch:
+            art = item[0]
+            art.float_data = {t: float_data.get(t, {}) for t in art.tickers}
+            if not any(art.float_data.values()):
+                logger.info(f"Skipping '{art.title}' — no float data")
+                self.database.known_urls.reject(art.url)
+                self._finish(item, SKIPPED)
+                continue
+            self.persist_q.put(item)
+
+    def _persist_stage(self):
+        stops = 0
+        with self.app.app_context():
+            while stops < self.enrich_workers:
+                # block for one item, then take whatever else is already queued
+                items = [self.persist_q.get()]
+                while len(items) < self.persist_batch:
+                    try:
+                        items.append(self.persist_q.get_nowait())
+                    except queue.Empty:
+                        break
+                batch = [item for item in items if item is not _STOP]
+                stops += len(items) - len(batch)
+                try:
+                    if batch:
+                        self._persist(batch)
+                except Exception as e:
+                    logger.error(f"[Pipeline] Persist failed for batch of {len(batch)}: {e}")
+                    for item in batch:
+                        self._finish(item, FAILED)
+                finally:
+                    for _ in items:
+                        self.persist_q.task_done()
+
+    def _persist(self, batch):
+        logger.info(f"Saving {len(batch)} articles")
+        saved, failed = self.database.save_articles([art for art, _ in batch])
+        for item in batch:
+            if item[0].url in failed:
+                self._finish(item, FAILED)
+            elif item[0].url in saved:
+                self._finish(item, SAVED)
+            else:
+                # stored earlier, by us or by another monitor
+                self._finish(item, SKIPPED)
@@ -5,38 +5,23 @@ Handles listing, detail view, manual refresh, and status.
 """
 
 import os
+import json
+import queue
 import logging
 from datetime import datetime
-from flask import Flask, render_template, jsonify, redirect, url_for, request
-from concurrent.futures import ThreadPoolExecutor
-import threading
-
-# Thread-safe scraper status tracker
-class ScraperStatus:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.status = {
-            "message": "Ready",
-            "progress": 0,
-            "last_update": None
-        }
-
-    def update(self, **kwargs):
-        with self.lock:
-            self.status.update(kwargs)
-
-    def get(self):
-        with self.lock:
-            return self.status.copy()
-
-scraper_status = ScraperStatus()
-
-from models import db, UserWatchlist
+from flask import Flask, Response, render_template, jsonify, redirect, url_for, request
+
+from models import db, UserWatchlist, upgrade_schema
 from pg_database import NewsDatabase
 from AccesswireScrapper import AccesswireScraper
 from GlobalnewswireScrapper import GlobalNewswireScraper
 from news_scraper import PRNewswireScraper
-from stock_data import StockDataFetcher
+from stock_data import StockDataFetcher, FloatCache
+from scrape_engine import get_engine, timed
+from job_queue import FetchQueue
+from events import EventBroker
+from status_store import ScraperStatus, SOURCES
+import metrics
 from dotenv import load_dotenv
 
 # -- App setup --------------------------------------------------------------
@@ -56,10 +41,15 @@ db.init_app(app)
 
 # Core instances
 news_db = NewsDatabase()
-stock_fetcher = StockDataFetcher()
-pr_scraper = PRNewswireScraper()
-access_scraper = AccesswireScraper()
-global_scraper = GlobalNewswireScraper()
+stock_fetcher = StockDataFetcher(cache=FloatCache(store=news_db))
+scrape_engine = get_engine()
+fetch_queue = FetchQueue()
+pr_scraper = PRNewswireScraper(known_urls=news_db.known_urls)
+access_scraper = AccesswireScraper(known_urls=news_db.known_urls)
+global_scraper = GlobalNewswireScraper(known_urls=news_db.known_urls)
+event_broker = EventBroker(app, news_db)
+# shared with main.py's monitor and the other workers through Postgres
+scraper_status = ScraperStatus(app)
 
 
 # Logging setup
@@ -68,41 +58,71 @@ logging.getLogger('werkzeug').setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 with app.app_context():
-    db.create_all()
+    # serialised across workers and the monitor by an advisory lock
+    upgrade_schema()
+    news_db.load_known_urls()
+
+def _parse_cursor(raw):
+    if not raw:
+        return None
+    try:
+        return news_db.decode_cursor(raw)
+    except ValueError:
+        return None
+
+def _next_cursor(articles, page_size):
+    last = articles[-1] if len(articles) == page_size else None
+    if last and last.published_at:
+        return news_db.encode_cursor(last)
+    return None
 
 @app.route('/')
 def index():
     page = request.args.get('page', 1, type=int)
+    before = request.args.get('before')
     filter_val = request.args.get('float_val', type=float)
     filter_op = request.args.get('filter_op', default='lt')
+    page_size = 50
 
-    articles = news_db.get_recent_articles(page=page, page_size=50)
-
-    def passes_filter(article):
-        if not article.tickers or not article.float_data:
-            return False
-        first = article.tickers[0]
-        val = article.float_data.get(first, {}).get('float')
-        if val and val.endswith('M'):
-            try:
-                num = float(val[:-1])
-                if filter_val is not None:
-                    return (num < filter_val) if filter_op == 'lt' else (num > filter_val)
-            except Exception:
-                return False
-        return False
-
-    filtered = list(filter(passes_filter, articles)) if filter_val else articles
+    # float filter runs in SQL so every page comes back full
+    articles = news_db.get_recent_articles(
+        page=page, page_size=page_size,
+        float_op=filter_op, float_val=filter_val or None,
+        before=_parse_cursor(before)
+    )
 
     return render_template(
         'index.html',
-        articles=filtered,
+        articles=articles,
         filter_val=filter_val or '',
         filter_op=filter_op or 'lt',
         page=page,
+        before=before,
+        next_cursor=_next_cursor(articles, page_size),
         status=scraper_status.get()
     )
 
+@app.route('/api/articles')
+def api_articles():
+    """JSON article list with keyset pagination via ?before=<cursor>."""
+    before = request.args.get('before')
+    cursor = _parse_cursor(before)
+    if before and cursor is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    filter_val = request.args.get('float_val', type=float)
+    filter_op = request.args.get('filter_op', default='lt')
+
+    articles = news_db.get_recent_articles(
+        page_size=limit,
+        float_op=filter_op, float_val=filter_val or None,
+        before=cursor
+    )
+    return jsonify({
+        'articles': [a.to_dict() for a in articles],
+        'next': _next_cursor(articles, limit)
+    })
+
 @app.route('/clear', methods=['POST'])
 def clear_all_articles():
     try:
@@ -127,21 +147,23 @@ def article_detail(article_id):
 def api_refresh():
     try:
         scraper_status.update(message='Refreshing…', progress=0)
+        # start from the monitor's mark; only the monitor moves and stores it,
+        # so a refresh never writes an older mark over a newer one
+        access_scraper.load_high_water_mark(news_db)
 
         # 1) fetch from all sources
         articles = []
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = [
-                executor.submit(pr_scraper.get_latest_news, 1),
-                executor.submit(access_scraper.get_latest_news, 5),
-                executor.submit(global_scraper.get_latest_news, 1),
-            ]
-            for i, future in enumerate(futures, start=1):
-                try:
-                    result = future.result()
-                    articles.extend(result)
-                except Exception as e:
-                    pass
+        results = scrape_engine.gather(
+            timed(pr_scraper.fetch_latest_news(1)),
+            timed(access_scraper.fetch_latest_news(5)),
+            timed(global_scraper.fetch_latest_news(1)),
+        )
+        for source, (result, seconds) in zip(SOURCES, results):
+            if isinstance(result, Exception):
+                scraper_status.record_source(source, seconds, error=result)
+                continue
+            scraper_status.record_source(source, seconds, articles=len(result))
+            articles.extend(result)
 
         logger.info(f"Total fetched articles: {len(articles)}")
         scraper_status.update(progress=20)
@@ -150,32 +172,34 @@ def api_refresh():
         logger.info(f"Articles with tickers: {len(articles)}")
 
         total = len(articles)
-        saved = 0
+        to_save = []
 
-        # 2) process + save
+        # 2) enrich + filter: one float lookup for every ticker of the refresh
+        all_float_data = stock_fetcher.get_batch_float_data(
+            list(dict.fromkeys(t for art in articles for t in art.tickers))
+        )
+        scraper_status.update(progress=60)
         for idx, art in enumerate(articles, start=1):
-            scraper_status.update(progress=int((idx / total) * 100))
-
             logger.info(f"[Refresh] Processing [{idx}/{total}] URL: {art.url}")
             logger.info(f"[Refresh] Tickers: {art.tickers}")
             if not art.tickers:
                 logger.info("Skipping article — no tickers")
                 continue
 
-            fd = stock_fetcher.get_batch_float_data(art.tickers)
-            logger.info(f"[FloatData DEBUG] Article URL: {art.url}")
-            logger.info(f"[FloatData DEBUG] Retrieved float data: {fd}")
-
+            fd = {t: all_float_data[t] for t in art.tickers if t in all_float_data}
             art.float_data = fd
             logger.info(f"[Refresh] Float data: {fd}")
             if not any(item.get('float') != 'N/A' for item in fd.values()):
                 logger.info("Skipping article — no valid float data")
+                news_db.known_urls.reject(art.url)
                 continue
 
-            logger.info(f"Saving article: {art.url} with tickers {art.tickers}")
-            logger.info("Saved to DB")
-            news_db.save_article(art)
-            saved += 1
+            to_save.append(art)
+
+        # 3) one transaction for the whole refresh; URLs the monitor already stored are skipped
+        stored, _ = news_db.save_articles(to_save)
+        saved = len(stored)
+        logger.info(f"Saved {saved} new articles to DB")
 
         scraper_status.update(
             message=f'Saved {saved}/{total}',
@@ -189,14 +213,12 @@ def api_refresh():
         return jsonify(status=scraper_status.get()['message'], success=False), 500
 @app.route("/api/check_ticker")
 def check_ticker():
-    from pg_database import NewsDatabase
     ticker = request.args.get("ticker", "").upper()
     if not ticker:
         return jsonify([]), 400
 
     limit = int(request.args.get("limit", 3))  # Allow ?limit=3, default to 3
-    db = NewsDatabase()
-    articles = db.get_articles_by_ticker(ticker, limit=limit)
+    articles = news_db.get_articles_by_ticker(ticker, limit=limit)
     if not articles:
         return jsonify([])
     result = []
@@ -211,6 +233,42 @@ def check_ticker():
 def api_status():
     return jsonify(scraper_status.get())
 
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of status changes and newly saved articles."""
+    q = event_broker.subscribe()
+
+    def stream():
+        try:
+            yield f"event: status\ndata: {json.dumps(scraper_status.get())}\n\n"
+            while True:
+                try:
+                    kind, data = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"  # lets proxies and the server notice dead clients
+                    continue
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_broker.unsubscribe(q)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus exposition, summed over the monitor and all workers."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/http_stats')
+def api_http_stats():
+    """Connection reuse per host for this process's scraping engine."""
+    return jsonify(scrape_engine.connection_stats())
+
+@app.route('/api/fetch_queue')
+def api_fetch_queue():
+    """Depth of the shared detail-fetch queue, across every monitor."""
+    return jsonify(fetch_queue.stats())
+
 # Watchlist API endpoints for persistent alerts
 @app.route('/api/watchlist', methods=['GET'])
 def get_watchlist():
@@ -248,6 +306,22 @@ def add_to_watchlist():
         db.session.rollback()
         return jsonify({'error': 'Failed to add ticker'}), 500
 
+@app.route('/api/watchlist/updates')
+def watchlist_updates():
+    """New articles for every watched ticker since the client's last-seen article id.
+
+    Without ``since`` nothing is returned except the current cursor, so a fresh
+    client starts from "now" instead of alerting on old news. Articles that
+    committed late may come back again behind the cursor; clients drop ids
+    they have already seen.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(articles=[], since=news_db.latest_article_id())
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    articles = news_db.get_watchlist_updates(since, limit=limit)
+    return jsonify(articles=articles, since=max([since] + [a['id'] for a in articles]))
+
 @app.route('/api/watchlist/<ticker>', methods=['DELETE'])
 def remove_from_watchlist(ticker):
     """Remove a ticker from the user's watchlist."""
@@ -0,0 +1,144 @@
+"""
+Per-source poll scheduling for the monitor.
+
+Each source gets its own timer. The base interval comes from the US market
+session (tight around the open, relaxed overnight and at weekends) and is
+scaled by the source's recently observed publish rate, then jittered. A source
+is never started again while its previous run is still in flight, and its next
+run is timed from when the previous one started, so slow scrapes don't stretch
+the schedule.
+"""
+import os
+import random
+import time
+from datetime import datetime, date, timedelta
+from news_scraper import ET
+
+# base poll interval in seconds per market session (US/Eastern)
+SESSION_INTERVALS = {
+    "premarket": 15,    # 04:00-09:30, when most releases cross the wires
+    "open": 10,         # 09:30-10:30
+    "regular": 30,      # 10:30-16:00
+    "afterhours": 30,   # 16:00-20:00, earnings
+    "overnight": 300,   # 20:00-04:00
+    "closed": 600,      # weekends and holidays
+}
+
+_BOUNDARIES = [(0, 0), (4, 0), (9, 30), (10, 30), (16, 0), (20, 0)]
+
+
+def _holidays():
+    """Exchange holidays from MARKET_HOLIDAYS (comma-separated ISO dates)."""
+    raw = os.getenv("MARKET_HOLIDAYS", "")
+    return {date.fromisoformat(d.strip()) for d in raw.split(",") if d.strip()}
+
+
+def market_session(now=None, holidays=None):
+    now = (now or datetime.now(ET)).astimezone(ET)
+    holidays = _holidays() if holidays is None else holidays
+    if now.weekday() >= 5 or now.date() in holidays:
+        return "closed"
+    hm = (now.hour, now.minute)
+    if hm < (4, 0) or hm >= (20, 0):
+        return "overnight"
+    if hm < (9, 30):
+        return "premarket"
+    if hm < (10, 30):
+        return "open"
+    if hm < (16, 0):
+        return "regular"
+    return "afterhours"
+
+
+def seconds_to_session_change(now=None, holidays=None):
+    """Seconds until market_session() next returns something different."""
+    now = (now or datetime.now(ET)).astimezone(ET)
+    holidays = _holidays() if holidays is None else holidays
+    current = market_session(now, holidays)
+    for day in range(8):
+        d = now.date() + timedelta(days=day)
+        for h, m in _BOUNDARIES:
+            at = datetime(d.year, d.month, d.day, h, m, tzinfo=ET)
+            if at > now and market_session(at, holidays) != current:
+                return (at - now).total_seconds()
+    return SESSION_INTERVALS["closed"]
+
+
+class SourceSchedule:
+    """Timer state for one source.
+
+    The publish rate is an exponentially weighted average of new items per
+    second. The session interval is scaled so that a poll is expected to find
+    about one new item, within [min_factor, max_factor] of the session base.
+    """
+
+    def __init__(self, name, min_factor=0.5, max_factor=2.0, jitter=0.1, smoothing=0.3):
+        self.name = name
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.jitter = jitter
+        self.smoothing = smoothing
+        self.rate = None
+        self.running = False
+        self.next_due = 0.0
+        self.started_at = None
+        self.last_started = None
+
+    def interval(self, session):
+        base = SESSION_INTERVALS[session]
+        if self.rate is None:
+            factor = 1.0
+        elif self.rate <= 0:
+            factor = self.max_factor
+        else:
+            factor = min(self.max_factor, max(self.min_factor, 1.0 / (self.rate * base)))
+        return base * factor
+
+    def start(self, now):
+        self.running = True
+        self.started_at = now
+
+    def finish(self, now, new_items=None, session=None, until_change=None):
+        """Record a finished run and schedule the next one; returns the delay used."""
+        if new_items is not None and self.last_started is not None:
+            observed = new_items / max(self.started_at - self.last_started, 1e-6)
+            self.rate = observed if self.rate is None else (
+                self.smoothing * observed + (1 - self.smoothing) * self.rate
+            )
+        self.last_started = self.started_at
+
+        delay = self.interval(session or market_session())
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        if until_change is not None:
+            # don't sleep through the start of a tighter session
+            delay = min(delay, until_change + random.uniform(0, 5))
+        self.next_due = max(self.started_at + delay, now)
+        self.running = False
+        return delay
+
+
+class PollScheduler:
+    """Decides which sources are due; the caller starts and finishes the runs."""
+
+    def __init__(self, names, clock=time.monotonic, **schedule_kwargs):
+        self.clock = clock
+        self.sources = {name: SourceSchedule(name, **schedule_kwargs) for name in names}
+
+    def due(self):
+        now = self.clock()
+        return [s.name for s in self.sources.values() if not s.running and s.next_due <= now]
+
+    def start(self, name):
+        self.sources[name].start(self.clock())
+
+    def finish(self, name, new_items=None):
+        """Mark ``name`` done (``new_items`` is None when the run failed); returns the next delay."""
+        return self.sources[name].finish(
+            self.clock(), new_items,
+            session=market_session(), until_change=seconds_to_session_change(),
+        )
+
+    def seconds_until_next(self, cap=1.0):
+        now = self.clock()
+        waiting = [s.next_due - now for s in self.sources.values() if not s.running]
+        return max(0.0, min(waiting + [cap]))
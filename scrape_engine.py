@@ -0,0 +1,194 @@
+"""
+Asyncio scraping engine shared by the wire scrapers.
+
+All HTTP traffic goes through one curl_cffi AsyncSession living on a dedicated
+event-loop thread. Listing and detail pages therefore download concurrently
+(bounded per host), while callers keep using the blocking ``get_latest_news``.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+from curl_cffi import CurlHttpVersion, CurlInfo
+from curl_cffi.requests import AsyncSession, Response
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class _Response(Response):
+    """Response that also keeps how many new connections its transfer opened."""
+
+    def __init__(self, curl=None, request=None):
+        super().__init__(curl, request)
+        # read before the session resets the handle for the next transfer
+        self.num_connects = curl.getinfo(CurlInfo.NUM_CONNECTS) if curl is not None else 0
+
+
+class ScrapeEngine:
+    """Owns the event loop, the shared AsyncSession and the per-host limits.
+
+    The session is created once and kept for the life of the process, so
+    connections (HTTP/2 where the host negotiates it) are reused across cycles.
+    """
+
+    def __init__(self, per_host_limit=4, pool_size=10, impersonate="chrome110", timeout=30):
+        self.per_host_limit = per_host_limit
+        self.pool_size = pool_size
+        self.impersonate = impersonate
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None
+        self._semaphores = {}
+        self._stats = {}
+        self._listings = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="scrape-engine", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro):
+        """Run a coroutine on the engine loop and block until it finishes."""
+        return self.submit(coro).result()
+
+    def gather(self, *coros):
+        """Run coroutines concurrently; a failing one yields its exception."""
+        async def _gather():
+            return await asyncio.gather(*coros, return_exceptions=True)
+        return self.run(_gather())
+
+    def _semaphore(self, url):
+        # only touched from the loop thread, so no locking needed
+        host = urlsplit(url).netloc
+        sem = self._semaphores.get(host)
+        if sem is None:
+            sem = self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return sem
+
+    async def request(self, method, url, **kwargs):
+        if self._session is None:
+            self._session = AsyncSession(
+                max_clients=self.pool_size,
+                http_version=CurlHttpVersion.V2TLS,
+                response_class=_Response,
+            )
+        kwargs.setdefault("impersonate", self.impersonate)
+        kwargs.setdefault("timeout", self.timeout)
+        async with self._semaphore(url):
+            resp = await self._session.request(method, url, **kwargs)
+        self._record(urlsplit(url).netloc, resp)
+        return resp
+
+    def _record(self, host, resp):
+        with self._lock:
+            stats = self._stats.setdefault(host, {"requests": 0, "connections": 0, "http2": 0})
+            stats["requests"] += 1
+            # each new connection is a fresh TCP/TLS handshake
+            stats["connections"] += getattr(resp, "num_connects", 0)
+            if getattr(resp, "http_version", None) == CurlHttpVersion.V2_0:
+                stats["http2"] += 1
+
+    def connection_stats(self):
+        """Per-host request, handshake and HTTP/2 counts since the engine started."""
+        with self._lock:
+            return {
+                host: dict(s, reused=max(0, s["requests"] - s["connections"]))
+                for host, s in self._stats.items()
+            }
+
+    async def get_listing(self, url, method="GET", **kwargs):
+        """Fetch a listing page, or return None when it is unchanged since last time.
+
+        ETag/Last-Modified are replayed as conditional headers; hosts that ignore
+        them are caught by comparing a hash of the body.
+        """
+        cached = self._listings.get(url, {})
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = await self.request(method, url, headers=headers, **kwargs)
+        if resp.status_code == 304:
+            logger.debug(f"Listing not modified: {url}")
+            return None
+        resp.raise_for_status()
+
+        digest = hashlib.sha1(resp.content).hexdigest()
+        unchanged = cached.get("hash") == digest
+        self._listings[url] = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "hash": digest,
+        }
+        if unchanged:
+            logger.debug(f"Listing content unchanged: {url}")
+            return None
+        return resp
+
+    def forget_listing(self, url):
+        """Drop remembered validators so the next fetch of ``url`` is parsed again."""
+        self._listings.pop(url, None)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        self._semaphores.clear()
+        self._listings.clear()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+async def emit(on_article, article):
+    """Hand an article to a (possibly blocking) sink without stalling the loop."""
+    if on_article is not None and article is not None:
+        await asyncio.to_thread(on_article, article)
+
+
+async def timed(coro):
+    """Await ``coro``; return (its result or the exception it raised, seconds taken)."""
+    start = time.monotonic()
+    try:
+        result = await coro
+    except Exception as e:
+        result = e
+    return result, time.monotonic() - start
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide engine shared by all scrapers."""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = ScrapeEngine(
+                per_host_limit=int(os.getenv("SCRAPER_HOST_LIMIT", 4)),
+                pool_size=int(os.getenv("SCRAPER_POOL_SIZE", 10)),
+            )
+        return _default_engine
@@ -2,10 +2,20 @@
 source venv/bin/activate
 export $(cat .env | xargs)
 
+# Prometheus samples from the monitor and every gunicorn worker are written
+# here and summed by /metrics; start from an empty directory each launch
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/newsdb-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Ticker symbol master used to validate extracted tickers; refreshed at most
+# daily, and a failed download keeps the previous file
+python3 ticker_extractor.py refresh --max-age 86400 || true
+
 # Start the Flask background thread (scraper)
 python3 main.py &
 
 # Start Gunicorn server
-exec gunicorn -w 4 -b 0.0.0.0:8000 run:app
+# threaded workers: each open /api/events stream holds a thread, not a whole worker
+exec gunicorn -w 4 --worker-class gthread --threads 32 -b 0.0.0.0:8000 run:app
 
 
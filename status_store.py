@@ -0,0 +1,108 @@
+"""
+Scraper status shared across processes through the ``scraper_status`` table.
+
+The monitor (main.py) and the gunicorn workers each hold a ScraperStatus, but
+they all read and write the same rows, so ``/api/status`` on any worker shows
+the monitor's progress as well as manual refreshes run on other workers.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from events import publish_status
+from models import db, StatusEntry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+GLOBAL = "global"
+SOURCE_PREFIX = "source:"
+# in the order /api/refresh gathers them
+SOURCES = ("prnewswire", "accesswire", "globenewswire")
+# messages and errors often carry raw exception text; keep the rows and NOTIFYs small
+MAX_MESSAGE = 500
+
+
+class ScraperStatus:
+    """Thread-safe status tracker backed by Postgres.
+
+    A write is a single upsert that merges the changed fields into the stored
+    JSON (and NOTIFYs SSE clients in the same transaction). Reads are served
+    from a per-process copy that is refreshed at most every ``read_ttl``
+    seconds. If the database is unreachable the local copy keeps working.
+    """
+
+    def __init__(self, app, read_ttl=1.0):
+        self.app = app
+        self.read_ttl = read_ttl
+        self.lock = threading.Lock()
+        self.status = {
+            "message": "Ready",
+            "progress": 0,
+            "last_update": None,
+            "sources": {},
+        }
+        self._read_at = 0.0
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get("message"), str):
+            kwargs["message"] = kwargs["message"][:MAX_MESSAGE]
+        data = self._write(GLOBAL, kwargs, notify=True)
+        with self.lock:
+            self.status.update(data or kwargs)
+
+    def get(self):
+        with self.lock:
+            if time.monotonic() - self._read_at < self.read_ttl:
+                return self.status.copy()
+        rows = self._read()
+        with self.lock:
+            if rows is not None:
+                sources = {}
+                for name, data in rows:
+                    if name == GLOBAL:
+                        self.status.update(data)
+                    elif name.startswith(SOURCE_PREFIX):
+                        sources[name[len(SOURCE_PREFIX):]] = data
+                self.status["sources"] = sources
+            self._read_at = time.monotonic()
+            return self.status.copy()
+
+    def record_source(self, source, duration, error=None, articles=None, next_poll=None):
+        """Store the outcome of one source's scrape; failures keep the last success time."""
+        now = datetime.utcnow().isoformat()
+        patch = {"last_run": now, "last_duration": round(duration, 3), "error": str(error)[:MAX_MESSAGE] if error else None}
+        if error is None:
+            patch["last_success"] = now
+            patch["articles"] = articles
+        if next_poll is not None:
+            patch["next_poll_in"] = round(next_poll, 1)
+        self._write(SOURCE_PREFIX + source, patch)
+
+    # -- storage ----------------------------------------------------------
+    def _write(self, name, patch, notify=False):
+        table = StatusEntry.__table__
+        stmt = pg_insert(table).values(name=name, data=patch, updated_at=db.func.now())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['name'],
+            set_={'data': table.c.data.op('||')(stmt.excluded.data), 'updated_at': stmt.excluded.updated_at},
+        ).returning(table.c.data)
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                data = conn.execute(stmt).scalar_one()
+                if notify:
+                    publish_status(data, conn=conn)
+                return data
+        except Exception as e:
+            logger.warning(f"Failed to write scraper status '{name}': {e}")
+            return None
+
+    def _read(self):
+        try:
+            with self.app.app_context(), db.engine.connect() as conn:
+                table = StatusEntry.__table__
+                return conn.execute(db.select(table.c.name, table.c.data)).all()
+        except Exception as e:
+            logger.warning(f"Failed to read scraper status: {e}")
+            return None
@@ -3,9 +3,13 @@
 Module for retrieving stock float, price, and market-cap from Yahoo Finance.
 """
 import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 import requests
 import yfinance as yf
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import YAHOO_ERRORS, YAHOO_SECONDS
 
 # Monkeypatch yfinance requests session
 from yfinance import shared
@@ -15,12 +19,169 @@ shared._requests.headers.update({
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
 })
 
+class FloatCache:
+    """Two-level float-data cache with separate TTLs for fundamentals and price.
+
+    Level one is an in-process LRU; misses fall through to ``store`` (anything
+    with ``load_float_data(symbols)``, i.e. the float_data table and its
+    updated_at) before the caller has to go to Yahoo.
+    """
+
+    def __init__(self, store=None, max_size=2048, float_ttl=6 * 3600, price_ttl=300):
+        self.store = store
+        self.max_size = max_size
+        self.float_ttl = float_ttl
+        self.price_ttl = price_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # symbol -> [data, fundamentals_at, price_at]
+
+    def lookup(self, symbols):
+        """Split symbols into (fresh data, price-stale data, missing/stale list)."""
+        now = time.time()
+        fresh, price_stale, missing = {}, {}, []
+        unknown = []
+        with self._lock:
+            for sym in symbols:
+                entry = self._entries.get(sym)
+                if entry is None:
+                    unknown.append(sym)
+                    continue
+                self._entries.move_to_end(sym)
+                self._classify(sym, entry, now, fresh, price_stale, missing)
+
+        if unknown and self.store is not None:
+            for sym, (data, updated_at) in self.store.load_float_data(unknown).items():
+                # updated_at is stored as naive UTC
+                ts = updated_at.replace(tzinfo=timezone.utc).timestamp() if updated_at else 0
+                self._store_entry(sym, [data, ts, ts])
+        with self._lock:
+            for sym in unknown:
+                entry = self._entries.get(sym)
+                if entry is None:
+                    missing.append(sym)
+                else:
+                    self._classify(sym, entry, now, fresh, price_stale, missing)
+        return fresh, price_stale, missing
+
+    def _classify(self, sym, entry, now, fresh, price_stale, missing):
+        data, fundamentals_at, price_at = entry
+        if now - fundamentals_at > self.float_ttl:
+            missing.append(sym)
+        elif now - price_at > self.price_ttl:
+            price_stale[sym] = data
+        else:
+            fresh[sym] = data
+
+    def put(self, symbol, data):
+        now = time.time()
+        self._store_entry(symbol, [data, now, now])
+
+    def put_price(self, symbol, price):
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                entry[0] = dict(entry[0], price=price)
+                entry[2] = time.time()
+                return entry[0]
+        return None
+
+    def _store_entry(self, symbol, entry):
+        with self._lock:
+            self._entries[symbol] = entry
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def format_float_data(ticker, raw, mc, price, name):
+    """Build the float-data dict shared by the batched and per-symbol paths."""
+    if raw >= 1_000_000_000:
+        float_str = f"{raw / 1_000_000_000:.2f}B"
+    else:
+        float_str = f"{raw / 1_000_000:.2f}M"
+
+    # Yahoo has no market cap for some listings; keep it unknown rather than $0
+    mc = mc or None
+    if mc is None:
+        mcap_str = 'N/A'
+    elif mc >= 1_000_000_000:
+        mcap_str = f"${mc / 1_000_000_000:.2f}B"
+    else:
+        mcap_str = f"${mc / 1_000_000:.2f}M"
+
+    return {
+        'symbol':    ticker,
+        'name':      name,
+        'float':     float_str,
+        'float_raw': raw,
+        'price':     price,
+        'market_cap': mcap_str,
+        'market_cap_raw': mc,
+        'updated_at': datetime.utcnow()
+    }
+
+
 class StockDataFetcher:
     """Fetch stock float, price & market-cap via yfinance in parallel."""
 
-    def __init__(self, max_workers=5):
+    QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+    CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+    QUOTE_FIELDS = "shortName,regularMarketPrice,sharesOutstanding,floatShares,marketCap"
+
+    def __init__(self, max_workers=5, cache=None, quote_url=None, batch_size=50, quote_backoff=60):
 
         self.max_workers = max_workers
+        self.cache = cache or FloatCache()
+        self.quote_url = quote_url or self.QUOTE_URL
+        self.batch_size = batch_size
+        self.session = shared._requests
+        self._crumb = None
+        # after a crumb or v7 failure the batched endpoint is skipped for this
+        # long, so a refusing Yahoo costs one set of timeouts, not one per lookup
+        self.quote_backoff = quote_backoff
+        self._quote_down_until = 0.0
+
+    def _quote_params(self, symbols):
+        params = {"symbols": ",".join(symbols), "fields": self.QUOTE_FIELDS}
+        if self.quote_url == self.QUOTE_URL:
+            # Yahoo wants a cookie-bound crumb on the v7 endpoint
+            if self._crumb is None:
+                self.session.get("https://fc.yahoo.com", timeout=10)
+                self._crumb = self.session.get(self.CRUMB_URL, timeout=10).text.strip()
+            params["crumb"] = self._crumb
+        return params
+
+    def get_batch_quotes(self, tickers, batch_size=None):
+        """Fetch many symbols per round trip; symbols the batch misses are left out."""
+        batch_size = batch_size or self.batch_size
+        results = {}
+        if time.monotonic() < self._quote_down_until:
+            return results
+        for i in range(0, len(tickers), batch_size):
+            chunk = tickers[i:i + batch_size]
+            try:
+                with YAHOO_SECONDS.labels("quote_batch").time():
+                    resp = self.session.get(self.quote_url, params=self._quote_params(chunk), timeout=10)
+                if resp.status_code in (401, 403):
+                    self._crumb = None
+                resp.raise_for_status()
+                rows = resp.json().get('quoteResponse', {}).get('result') or []
+            except Exception:
+                YAHOO_ERRORS.labels("quote_batch").inc()
+                # the remaining chunks would fail the same way; fall back to per-symbol lookups
+                self._quote_down_until = time.monotonic() + self.quote_backoff
+                break
+
+            for row in rows:
+                sym = row.get('symbol')
+                raw = row.get('floatShares') or row.get('sharesOutstanding')
+                if not sym or not raw:
+                    continue
+                results[sym] = format_float_data(
+                    sym, raw, row.get('marketCap'),
+                    row.get('regularMarketPrice', 'N/A'), row.get('shortName', 'N/A'),
+                )
+        return results
 
     def get_float_data(self, ticker):
         """Return a dict with 'symbol', 'name', 'float', 'price', 'market_cap' or None."""
@@ -29,49 +190,73 @@ class StockDataFetcher:
         for attempt in range(max_retries):
             try:
                 stock = yf.Ticker(ticker)
-                info = stock.info
+                with YAHOO_SECONDS.labels("info").time():
+                    info = stock.info
 
                 raw = info.get('floatShares') or info.get('sharesOutstanding')
                 if not raw:
                     return None
 
-                if raw >= 1_000_000_000:
-                    float_str = f"{raw / 1_000_000_000:.2f}B"
-                else:
-                    float_str = f"{raw / 1_000_000:.2f}M"
-
-                mc = info.get('marketCap') or 0
-                if mc >= 1_000_000_000:
-                    mcap_str = f"${mc / 1_000_000_000:.2f}B"
-                else:
-                    mcap_str = f"${mc / 1_000_000:.2f}M"
-
-                price = info.get('currentPrice', 'N/A')
-                name  = info.get('shortName', 'N/A')
-
-                return {
-                    'symbol':    ticker,
-                    'name':      name,
-                    'float':     float_str,
-                    'float_raw': raw,
-                    'price':     price,
-                    'market_cap': mcap_str
-                }
+                return format_float_data(
+                    ticker, raw, info.get('marketCap'),
+                    info.get('currentPrice', 'N/A'), info.get('shortName', 'N/A'),
+                )
 
             except Exception:
+                YAHOO_ERRORS.labels("info").inc()
                 if attempt < max_retries - 1:
                     time.sleep(1)
                     continue
                 return None
 
+    def get_price(self, ticker):
+        """Cheap last-price lookup used when only the cached price has gone stale."""
+        try:
+            with YAHOO_SECONDS.labels("fast_info").time():
+                return yf.Ticker(ticker).fast_info.last_price
+        except Exception:
+            YAHOO_ERRORS.labels("fast_info").inc()
+            return None
+
+    def _refresh(self, ticker, stale_data=None):
+        if stale_data is not None:
+            price = self.get_price(ticker)
+            if price is not None:
+                return self.cache.put_price(ticker, price) or dict(stale_data, price=price)
+
+        data = self.get_float_data(ticker)
+        if data:
+            self.cache.put(ticker, data)
+        return data
+
     def get_batch_float_data(self, tickers):
-        """Fetch multiple tickers in parallel and omit any None results."""
+        """Fetch multiple tickers and omit any None results.
+
+        Only tickers that are missing from the cache or stale go to Yahoo, first
+        through the batched quote endpoint and then in parallel one by one.
+        """
         results = {}
         if not tickers:
             return results
 
+        fresh, price_stale, missing = self.cache.lookup(list(dict.fromkeys(tickers)))
+        results.update(fresh)
+        if not price_stale and not missing:
+            return results
+
+        # one round trip for everything stale, then per-symbol only for what it missed
+        batched = self.get_batch_quotes(list(price_stale) + missing)
+        for sym, data in batched.items():
+            self.cache.put(sym, data)
+            results[sym] = data
+            price_stale.pop(sym, None)
+        missing = [t for t in missing if t not in batched]
+        if not price_stale and not missing:
+            return results
+
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.get_float_data, t): t for t in tickers}
+            futures = {executor.submit(self._refresh, t, d): t for t, d in price_stale.items()}
+            futures.update({executor.submit(self._refresh, t): t for t in missing})
             for fut in as_completed(futures):
                 sym = futures[fut]
                 try:
@@ -81,4 +266,4 @@ class StockDataFetcher:
                 except:
                     pass
 
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,263 @@
+"""
+Ticker extraction shared by the wire scrapers.
+
+One precompiled regex finds exchange-prefixed symbols in a single pass:
+"(NASDAQ: ABCD)", "NYSE American: XYZ", "OTCQB: ABCD", "TSX-V: ABC",
+"CSE: ABC" and their variants. Each match is rewritten to the symbol Yahoo
+Finance uses: class shares as BRK-B, and Canadian listings with a .TO, .V or
+.CN suffix. It is then checked against a symbol master loaded from a local
+CSV, so misreads and non-tickers never cost a yfinance lookup.
+
+Refresh the master (e.g. daily, start.sh does it on launch) with
+
+    python ticker_extractor.py refresh [--extra cse_listings.csv]
+
+A market the master has no symbols for at all is passed through unchecked,
+and so is one whose directory was missing from the last refresh (e.g. only
+the OTC list failed), so a missing or partial file degrades to the old
+behaviour rather than dropping every article.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_MASTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv")
+
+_TICKER_RE = re.compile(r"""
+    (?=[NnOoTtCc])  # cheap first-character check before trying the alternatives
+    \b(?P<exchange>(?i:
+        nasdaq(?:\s*(?:gs|gm|cm))?
+      | nyse(?:\s*(?:american|mkt|arca))?
+      | otc(?:\s*(?:qx|qb|pink|markets|mkts|bb))?
+      | tsx(?:\s*-?\s*(?:v\b|venture))?(?:\s+exchange)?
+      | cse
+    ))
+    \s*:\s*
+    (?P<symbol>[A-Z][A-Z0-9]{0,5}(?:[.-][A-Z0-9]{1,2})?)\b
+""", re.X)
+
+# Yahoo suffix per exchange prefix; US listings (incl. OTC) have none
+_MARKET_SUFFIX = (("tsxv", ".V"), ("tsx-v", ".V"), ("tsxventure", ".V"), ("tsx", ".TO"), ("cse", ".CN"))
+
+
+def _suffix(exchange):
+    compact = re.sub(r"\s+", "", exchange.lower())
+    for prefix, suffix in _MARKET_SUFFIX:
+        if compact.startswith(prefix):
+            return suffix
+    return ""
+
+
+def _market(symbol):
+    """The market a Yahoo symbol belongs to: its suffix, or '' for US listings."""
+    base, dot, suffix = symbol.rpartition(".")
+    return "." + suffix if dot else ""
+
+
+def yahoo_symbol(exchange, symbol):
+    return symbol.replace(".", "-") + _suffix(exchange)
+
+
+class SymbolMaster:
+    """Set of known Yahoo symbols from a CSV with a ``symbol`` column.
+
+    Loaded on first use and re-read when the file changes (checked at most
+    every ``recheck`` seconds), so a refresh reaches long-running processes.
+    """
+
+    def __init__(self, path=None, recheck=60):
+        self.path = path or os.getenv("SYMBOL_MASTER", DEFAULT_MASTER_PATH)
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._symbols = frozenset()
+        self._markets = frozenset()
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.recheck:
+            return
+        with self._lock:
+            if now - self._checked_at < self.recheck:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                if self._mtime is not False:
+                    logger.warning(f"[Tickers] No symbol master at {self.path}; tickers are not validated")
+                    self._symbols, self._markets, self._mtime = frozenset(), frozenset(), False
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, newline="", encoding="utf-8") as f:
+                    rows = [row for row in csv.DictReader(f) if row.get("symbol")]
+            except Exception as e:
+                logger.error(f"[Tickers] Failed to load symbol master {self.path}: {e}")
+                return
+            symbols = frozenset(row["symbol"] for row in rows)
+            markets = {_market(s) for s in symbols}
+            sources = {row.get("source") for row in rows}
+            # a file written by refresh_master lists every directory that loaded;
+            # a market with one of its directories missing cannot rule symbols out
+            missing = [src for src in SOURCES if src not in sources] if sources & set(SOURCES) else []
+            if missing:
+                markets -= {SOURCE_MARKETS[src] for src in missing}
+                logger.warning(
+                    f"[Tickers] Symbol master has no {', '.join(missing)} symbols; "
+                    f"not validating {', '.join(sorted({SOURCE_MARKETS[src] or 'US' for src in missing}))} tickers"
+                )
+            self._symbols = symbols
+            self._markets = frozenset(markets)
+            self._mtime = mtime
+            logger.info(f"[Tickers] Loaded {len(symbols)} symbols from {self.path}")
+
+    def is_known(self, symbol):
+        """False only for symbols of a market the master covers but does not list."""
+        self._refresh()
+        return symbol in self._symbols or _market(symbol) not in self._markets
+
+    def __len__(self):
+        self._refresh()
+        return len(self._symbols)
+
+
+default_master = SymbolMaster()
+
+
+def extract_tickers(text, master=None):
+    """Exchange-prefixed tickers in ``text`` as Yahoo symbols, in order of first mention."""
+    master = default_master if master is None else master
+    tickers = {}
+    for m in _TICKER_RE.finditer(text or ""):
+        symbol = yahoo_symbol(m.group("exchange"), m.group("symbol"))
+        if symbol not in tickers:
+            tickers[symbol] = master.is_known(symbol)
+    rejected = [s for s, ok in tickers.items() if not ok]
+    if rejected:
+        logger.info(f"[Tickers] Dropped symbols not in the master: {', '.join(rejected)}")
+    return [s for s, ok in tickers.items() if ok]
+
+
+# -- refreshing the master ------------------------------------------------------
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+OTC_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otclist.txt"
+TMX_DIRECTORY_URL = "https://www.tsx.com/json/company-directory/search/{market}/%5E*"
+
+_OTHER_EXCHANGES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+_PLAIN_SYMBOL = re.compile(r"^[A-Z][A-Z0-9]{0,5}(?:[.-][A-Z0-9]{1,2})?$")
+
+
+def _get(url):
+    resp = requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0 newsdb symbol refresh"})
+    resp.raise_for_status()
+    return resp.text
+
+
+def _nasdaq_trader_rows(text, symbol_field, exchange):
+    rows = []
+    for row in csv.DictReader(io.StringIO(text), delimiter="|"):
+        symbol = (row.get(symbol_field) or "").strip()
+        if row.get("Test Issue") == "Y" or not _PLAIN_SYMBOL.match(symbol):
+            continue  # test issues, the trailing "File Creation Time" line, preferreds like ABC$A
+        rows.append((symbol.replace(".", "-"), exchange(row)))
+    return rows
+
+
+def _source_rows(source):
+    if source == "nasdaq":
+        return _nasdaq_trader_rows(_get(NASDAQ_LISTED_URL), "Symbol", lambda row: "NASDAQ")
+    if source == "other":
+        return _nasdaq_trader_rows(
+            _get(OTHER_LISTED_URL), "ACT Symbol", lambda row: _OTHER_EXCHANGES.get(row.get("Exchange"), "US"),
+        )
+    if source == "otc":
+        return _nasdaq_trader_rows(_get(OTC_LISTED_URL), "Symbol", lambda row: "OTC")
+    if source in ("tsx", "tsxv"):
+        suffix = ".TO" if source == "tsx" else ".V"
+        rows = []
+        for company in json.loads(_get(TMX_DIRECTORY_URL.format(market=source))).get("results", []):
+            for listing in [company] + company.get("instruments", []):
+                symbol = (listing.get("symbol") or "").strip()
+                if _PLAIN_SYMBOL.match(symbol):
+                    rows.append((symbol.replace(".", "-") + suffix, source.upper()))
+        return rows
+    raise ValueError(f"unknown symbol source '{source}'")
+
+
+# refresh source -> market (Yahoo suffix) its symbols belong to
+SOURCE_MARKETS = {"nasdaq": "", "other": "", "otc": "", "tsx": ".TO", "tsxv": ".V"}
+SOURCES = tuple(SOURCE_MARKETS)
+
+
+def refresh_master(path=None, extra=(), max_age=None):
+    """Rebuild the master CSV; a source that fails keeps its rows from the previous file."""
+    path = path or os.getenv("SYMBOL_MASTER", DEFAULT_MASTER_PATH)
+    if max_age is not None and os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+        logger.info(f"[Tickers] Symbol master {path} is fresh, not refreshing")
+        return None
+
+    previous = {}
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                previous.setdefault(row.get("source"), []).append((row["symbol"], row.get("exchange", "")))
+
+    rows = {}
+    for source in SOURCES:
+        try:
+            got = _source_rows(source)
+            logger.info(f"[Tickers] {source}: {len(got)} symbols")
+        except Exception as e:
+            got = previous.get(source, [])
+            logger.warning(f"[Tickers] {source} refresh failed ({e}); keeping {len(got)} previous symbols")
+            if not got:
+                logger.warning(f"[Tickers] No {source} symbols; its market will not be validated")
+        for symbol, exchange in got:
+            rows.setdefault(symbol, (exchange, source))
+    # hand-maintained lists (e.g. CSE listings as ABC.CN), same CSV layout
+    for extra_path in extra:
+        with open(extra_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("symbol"):
+                    rows.setdefault(row["symbol"], (row.get("exchange", ""), "extra"))
+
+    if not rows:
+        logger.error(f"[Tickers] No symbols from any source, leaving {path} untouched")
+        return 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "exchange", "source"])
+        for symbol in sorted(rows):
+            writer.writerow([symbol, *rows[symbol]])
+    os.replace(tmp, path)
+    logger.info(f"[Tickers] Wrote {len(rows)} symbols to {path}")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Ticker symbol master maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="download the listed-symbol directories")
+    refresh.add_argument("--path", help="CSV to write (default: SYMBOL_MASTER or data/symbols.csv)")
+    refresh.add_argument("--extra", action="append", default=[], help="extra CSV with a symbol column")
+    refresh.add_argument("--max-age", type=float, help="skip if the file is younger than this many seconds")
+    args = parser.parse_args()
+    refresh_master(args.path, args.extra, args.max_age)